@@ -0,0 +1,118 @@
+"""Async synthesis API for asyncio applications.
+
+Inference is blocking, so AsyncSynthesizer runs it on a small thread pool and
+hands the results back to the event loop:
+
+    synth = AsyncSynthesizer()
+    wav, sample_rate = await synth.synthesize("Hello there.", voice="female")
+    async for chunk in synth.stream(long_text, voice="clone", speaker_wav="me.wav"):
+        await send(chunk)
+
+Models come from the shared model pool, so they are loaded once and shared
+with everything else in the process; calls into one model run one at a time
+(runtime_config.model_lock), so the executor only runs different voices side
+by side. At most max_pending requests are admitted at a time; further calls
+wait for a free slot, which pushes back on producers instead of piling up
+work. Cancelling the calling task (or hitting the timeout) stops the request
+at the next chunk boundary: a chunk not started yet is dropped, and a chunk
+already running cannot be interrupted, so the request keeps its slot until
+that chunk is done.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from chunking import crossfade_concat, split_text
+from model_pool import get_pool
+from profiling import run_in_context
+from runtime_config import get_runtime_config, resolve_device
+from streaming import synthesize_sentence
+from voices import model_for_voice
+
+DEFAULT_MAX_PENDING = 8
+
+
+class AsyncSynthesizer:
+    """Runs synthesis requests on a bounded executor for asyncio callers"""
+
+    def __init__(self, device=None, backend="pytorch", workers=None, max_pending=DEFAULT_MAX_PENDING, pool=None):
+        self.device = resolve_device(device)
+        self.backend = backend
+        self.pool = pool or get_pool()
+        self._executor = ThreadPoolExecutor(max_workers=workers or get_runtime_config().max_jobs_for(self.device),
+                                            thread_name_prefix="tts-async")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def synthesize(self, text, voice="female", speaker=None, speaker_wav=None, language=None, timeout=None):
+        """Render the whole text, returns (float32 waveform, sample rate)"""
+        chunks = []
+        sample_rate = None
+        async for chunk, sample_rate in self._chunks(text, voice, speaker, speaker_wav, language, timeout):
+            chunks.append(chunk)
+        if not chunks:
+            return np.zeros(0, dtype=np.float32), sample_rate
+        # The same 10 ms crossfades at chunk joins as every other path
+        return crossfade_concat(chunks, sample_rate), sample_rate
+
+    async def stream(self, text, voice="female", speaker=None, speaker_wav=None, language=None, timeout=None):
+        """Yield a float32 waveform per chunk of text as soon as it is rendered"""
+        async for chunk, _ in self._chunks(text, voice, speaker, speaker_wav, language, timeout):
+            yield chunk
+
+    async def sample_rate(self, voice="female"):
+        tts = await self._load(model_for_voice(voice), None)
+        return tts.synthesizer.output_sample_rate
+
+    async def _chunks(self, text, voice, speaker, speaker_wav, language, timeout):
+        if voice == "clone" and not speaker_wav:
+            raise ValueError("The clone voice needs a speaker_wav reference clip")
+        if voice == "male":
+            speaker = speaker or "p226"
+        loop = asyncio.get_running_loop()
+        # One deadline for the whole request, including the wait for a slot
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        await self._wait(self._slots.acquire(), deadline)
+        job = None  # this request's latest job on the executor
+        try:
+            job = self._submit_load(model_for_voice(voice))
+            tts = await self._wait(asyncio.wrap_future(job), deadline)
+            sample_rate = tts.synthesizer.output_sample_rate
+            for sentence in split_text(text, language or "en"):
+                job = self._executor.submit(run_in_context(synthesize_sentence), tts, sentence, speaker=speaker,
+                                            speaker_wav=speaker_wav, language=language)
+                chunk = await self._wait(asyncio.wrap_future(job), deadline)
+                yield chunk, sample_rate
+        finally:
+            if job is None or job.cancel() or job.done():
+                self._slots.release()
+            else:
+                # Still running after a timeout or cancellation: the slot is freed when the
+                # job ends, so abandoned work never piles up beyond max_pending
+                job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._slots.release))
+
+    def _submit_load(self, model_name):
+        # Cloning always runs on the PyTorch XTTS model
+        backend = "pytorch" if model_name == model_for_voice("clone") else self.backend
+        return self._executor.submit(self.pool.get, model_name, self.device, backend)
+
+    async def _load(self, model_name, deadline):
+        return await self._wait(asyncio.wrap_future(self._submit_load(model_name)), deadline)
+
+    @staticmethod
+    async def _wait(awaitable, deadline):
+        if deadline is None:
+            return await awaitable
+        remaining = deadline - asyncio.get_running_loop().time()
+        return await asyncio.wait_for(awaitable, max(remaining, 0))
+
+    def close(self):
+        """Stop the executor; chunks already running are allowed to finish"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
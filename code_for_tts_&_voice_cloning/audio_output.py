@@ -0,0 +1,216 @@
+"""Output stage: encode audio to WAV, FLAC, OGG/Vorbis, Opus or MP3 as it is produced.
+
+StreamEncoder takes waveform chunks as they come out of the pipeline and
+hands them straight to libsndfile (through soundfile), so a compressed file
+is written incrementally and never held in memory as a whole. The format
+follows the file extension; the output can be resampled, written with a
+different bit depth (WAV/FLAC) and mixed down to mono.
+
+Levels are the same for every format: write_audio() peak-normalizes a whole
+waveform the way Coqui's save_wav does, and a stream, whose peak is not known
+in advance, is only clipped. Resampling runs once over the stream with a
+filter that carries its state across chunks, so chunk boundaries leave no
+seams.
+
+Which compressed formats work depends on the local libsndfile build:
+Opus needs 1.0.29 or newer, MP3 1.1.0 or newer. available_formats() lists
+what is usable here.
+
+Example:
+    with StreamEncoder("chapter.opus", 22050) as encoder:
+        for chunk in stream_long_text(tts, text):
+            encoder.write(chunk)
+"""
+import math
+import os
+
+import numpy as np
+
+# extension -> (libsndfile container, subtype); WAV/FLAC subtypes follow the bit depth
+FORMATS = {
+    "wav": ("WAV", None),
+    "flac": ("FLAC", None),
+    "ogg": ("OGG", "VORBIS"),
+    "opus": ("OGG", "OPUS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+PCM_SUBTYPES = {16: "PCM_16", 24: "PCM_24", 32: "FLOAT"}
+# Opus only encodes at these rates, other input is resampled to the nearest one above
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+
+def format_for_path(path):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext not in FORMATS:
+        raise ValueError(f"Unsupported output format '.{ext}', expected one of: {', '.join(FORMATS)}")
+    return ext
+
+
+def available_formats():
+    """Extensions the local soundfile/libsndfile can write"""
+    try:
+        import soundfile as sf
+    except ImportError:
+        return ["wav"]
+    containers = sf.available_formats()
+    available = []
+    for ext, (container, subtype) in FORMATS.items():
+        if container in containers and (subtype is None or subtype in sf.available_subtypes(container)):
+            available.append(ext)
+    return available
+
+
+def _subtype(ext, bit_depth):
+    container, subtype = FORMATS[ext]
+    if subtype is not None:
+        return subtype
+    if bit_depth not in PCM_SUBTYPES or (container == "FLAC" and bit_depth == 32):
+        raise ValueError(f"Bit depth {bit_depth} is not supported for .{ext}")
+    return PCM_SUBTYPES[bit_depth]
+
+
+def output_sample_rate(ext, sample_rate, target_rate=None):
+    rate = target_rate or sample_rate
+    if ext == "opus" and rate not in OPUS_SAMPLE_RATES:
+        rate = next((r for r in OPUS_SAMPLE_RATES if r >= rate), OPUS_SAMPLE_RATES[-1])
+    return rate
+
+
+def to_mono(chunk):
+    """Mix (samples, channels) audio down to one channel"""
+    chunk = np.asarray(chunk, dtype=np.float32)
+    return chunk.mean(axis=1) if chunk.ndim > 1 else chunk
+
+
+def normalize_peak(wav):
+    """Scale a whole waveform to full scale, like Coqui's save_wav (and result_cache.write_wav)"""
+    wav = np.asarray(wav, dtype=np.float32)
+    peak = max(0.01, float(np.max(np.abs(wav)))) if wav.size else 1.0
+    return wav * (32767 / 32768 / peak)
+
+
+class StreamResampler:
+    """Polyphase resampling of a signal that arrives in chunks, with the output of a single pass.
+
+    Each write resamples the new samples together with some context before
+    them and holds back the last few input samples until the next chunk (or
+    flush) arrives, so every output sample sees its full filter.
+    """
+
+    def __init__(self, input_rate, output_rate):
+        divisor = math.gcd(int(input_rate), int(output_rate))
+        self.up = int(output_rate) // divisor
+        self.down = int(input_rate) // divisor
+        # Half the length of resample_poly's default filter, in input samples, with a margin
+        self.context = 2 * math.ceil(10 * max(self.up, self.down) / self.up) + 2
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._start = 0  # input index of _buffer[0], kept a multiple of down
+        self._received = 0  # input samples so far
+        self._emitted = 0  # output samples so far
+
+    def write(self, chunk):
+        """Resampled output that is final, given the input so far"""
+        self._buffer = np.concatenate([self._buffer, np.asarray(chunk, dtype=np.float32)])
+        self._received += len(chunk)
+        return self._process(self._received - self.context)
+
+    def flush(self):
+        """The rest of the output, once the input has ended"""
+        return self._process(self._received, final=True)
+
+    def _process(self, ready, final=False):
+        from scipy.signal import resample_poly
+        # Output n lies at input position n * down / up; emit those before `ready`
+        end = math.ceil(self._received * self.up / self.down) if final else math.ceil(ready * self.up / self.down)
+        if end <= self._emitted or not len(self._buffer):
+            return np.zeros(0, dtype=np.float32)
+        out = resample_poly(self._buffer, self.up, self.down)
+        offset = self._start * self.up // self.down
+        block = out[self._emitted - offset:end - offset].astype(np.float32)
+        self._emitted = end
+        # Keep enough input before the next output sample for its filter
+        keep_from = max(self._start, (ready - self.context) // self.down * self.down)
+        self._buffer = self._buffer[keep_from - self._start:]
+        self._start = keep_from
+        return block
+
+
+class StreamEncoder:
+    """Writes chunks to a WAV/FLAC/OGG/Opus/MP3 file as they arrive"""
+
+    def __init__(self, path, sample_rate, target_rate=None, bit_depth=16, compression_level=None):
+        self.path = path
+        self.ext = format_for_path(path)
+        self.input_rate = int(sample_rate)
+        self.sample_rate = output_sample_rate(self.ext, self.input_rate, target_rate)
+        self.samples = 0
+        self._resampler = StreamResampler(self.input_rate, self.sample_rate) \
+            if self.sample_rate != self.input_rate else None
+        subtype = _subtype(self.ext, bit_depth)
+        try:
+            import soundfile as sf
+        except ImportError:
+            if self.ext != "wav" or subtype != "PCM_16":
+                raise ImportError(f"Writing .{self.ext} files needs the soundfile package") from None
+            # 16-bit WAV also works without soundfile
+            self._file = _WaveWriter(path, self.sample_rate)
+            return
+        container, _ = FORMATS[self.ext]
+        self._file = sf.SoundFile(path, "w", samplerate=self.sample_rate, channels=1,
+                                  format=container, subtype=subtype)
+        if compression_level is not None:
+            # 0 (fastest/largest) to 1 (smallest); needs soundfile 0.12+
+            self._file.compression_level = compression_level
+
+    def write(self, chunk):
+        chunk = to_mono(chunk)
+        if self._resampler is not None:
+            chunk = self._resampler.write(chunk)
+        self._write(chunk)
+
+    def _write(self, chunk):
+        if not len(chunk):
+            return
+        # Clipped, not peak-normalized: later chunks are not known yet
+        self._file.write(np.clip(chunk, -1.0, 1.0))
+        self.samples += len(chunk)
+
+    @property
+    def seconds(self):
+        return self.samples / self.sample_rate
+
+    def close(self):
+        if self._resampler is not None:
+            self._write(self._resampler.flush())
+            self._resampler = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _WaveWriter:
+    """16-bit mono WAV through the standard library"""
+
+    def __init__(self, path, sample_rate):
+        import wave
+        self._wave = wave.open(path, "wb")
+        self._wave.setnchannels(1)
+        self._wave.setsampwidth(2)
+        self._wave.setframerate(sample_rate)
+
+    def write(self, chunk):
+        # Scaled like soundfile's PCM_16, so both writers produce the same samples
+        self._wave.writeframes(np.clip(chunk * 32768, -32768, 32767).astype("<i2").tobytes())
+
+    def close(self):
+        self._wave.close()
+
+
+def write_audio(path, wav, sample_rate, target_rate=None, bit_depth=16):
+    """Write a whole waveform, peak-normalized, in the format given by the file extension"""
+    with StreamEncoder(path, sample_rate, target_rate=target_rate, bit_depth=bit_depth) as encoder:
+        encoder.write(normalize_peak(to_mono(wav)))
@@ -0,0 +1,260 @@
+"""Non-interactive batch text-to-speech.
+
+Reads a CSV or JSONL manifest with one utterance per row and renders every
+row with a pool of worker processes. Each worker loads a model once and
+reuses it for all of its rows. On CPU under Linux/macOS the models are
+loaded once in the parent and the workers are forked from it, so they share
+the weights instead of each loading its own copy (see worker_farm.py).
+Rows whose output file already exists are skipped, so an interrupted run can
+simply be started again.
+
+Manifest columns:
+    text         text to speak (required)
+    voice        female, male or clone (default: female)
+    speaker      VCTK speaker for the male voice (default: p232)
+    language     language code for clone rows (default: en)
+    speaker_wav  reference clip for clone rows
+    library_voice  name of a voice library entry for clone rows (instead of speaker_wav)
+    output       output path (default: <output-dir>/<row number>.<format>);
+                 the extension picks the format (wav, flac, ogg, opus, mp3)
+
+Example:
+    python batch_tts.py prompts.jsonl --output-dir prompts --workers 4
+    python batch_tts.py prompts.jsonl --format opus --sample-rate 24000
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from audio_output import FORMATS
+from voices import BACKENDS, VOICES, model_for_voice
+from runtime_config import configure, get_runtime_config, resolve_device
+from worker_farm import WorkerFarm, can_share_models
+
+DEFAULT_MALE_SPEAKER = "p232"
+
+
+def read_manifest(path):
+    """Load manifest rows from a .csv or .jsonl file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    library_voices = None
+    for index, row in enumerate(rows):
+        if not row.get("text"):
+            raise ValueError(f"Row {index + 1} has no text")
+        voice = row.get("voice") or "female"
+        if voice not in VOICES:
+            raise ValueError(f"Row {index + 1}: unknown voice '{voice}'")
+        if voice == "clone" and not (row.get("speaker_wav") or row.get("library_voice")):
+            raise ValueError(f"Row {index + 1}: clone rows need a speaker_wav or a library_voice")
+        if voice == "clone" and row.get("library_voice"):
+            if library_voices is None:
+                from voice_library import get_voice_library
+                library_voices = set(get_voice_library().names())
+            if row["library_voice"] not in library_voices:
+                raise ValueError(f"Row {index + 1}: no voice named '{row['library_voice']}' in the voice library")
+        row["voice"] = voice
+    return rows
+
+
+def output_path(row, index, output_dir, audio_format="wav"):
+    return row.get("output") or os.path.join(output_dir, f"{index + 1:06d}.{audio_format}")
+
+
+def _init_worker(threads_per_worker=None, device="cpu"):
+    # Models this process loads get these settings from the runtime config;
+    # threads None uses all cores
+    configure(device=device, threads=threads_per_worker, max_jobs=1)
+
+
+def row_model(row, backend="pytorch"):
+    """(model name, backend) that renders a row; only the VITS voices can run from an exported artifact"""
+    return model_for_voice(row["voice"]), backend if row["voice"] != "clone" else "pytorch"
+
+
+def render_row(row, file_path, device="cpu", backend="pytorch", sample_rate=None, bit_depth=16):
+    """Synthesize one manifest row, returns (audio seconds, synthesis seconds)"""
+    from model_pool import get_pool
+    from result_cache import cache_key, get_result_cache
+    from audio_output import write_audio
+    from chunking import render_long_text
+
+    model_name, backend = row_model(row, backend)
+    speaker = (row.get("speaker") or DEFAULT_MALE_SPEAKER) if row["voice"] == "male" else None
+    language = (row.get("language") or "en") if row["voice"] == "clone" else None
+    speaker_wav = row.get("speaker_wav") if row["voice"] == "clone" else None
+    if row["voice"] == "clone" and row.get("library_voice"):
+        from voice_library import get_voice_library
+        speaker_wav = get_voice_library().load(row["library_voice"])
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    # Write to a temporary file first so a killed run never leaves a truncated output behind
+    base, ext = os.path.splitext(file_path)
+    tmp_path = base + ".part" + ext
+    encoding = {"target_rate": sample_rate, "bit_depth": bit_depth}
+
+    # Repeated prompts are served from the shared result cache
+    cache = get_result_cache()
+    key = cache_key(model_name, row["text"], speaker=speaker, speaker_wav=speaker_wav, language=language,
+                    backend=backend, device=device)
+    cached = cache.get(key)
+    if cached is not None:
+        wav, rate = cached
+        write_audio(tmp_path, wav, rate, **encoding)
+        os.replace(tmp_path, file_path)
+        return len(wav) / rate, 0.0
+
+    tts = get_pool().get(model_name, device, backend)
+
+    start = time.perf_counter()
+    # Rows already run in parallel processes, so chunks of one row run one after another
+    wav = render_long_text(tts, row["text"], speaker=speaker, speaker_wav=speaker_wav,
+                           language=language, workers=1)
+    synthesis_time = time.perf_counter() - start
+
+    rate = tts.synthesizer.output_sample_rate
+    cache.put(key, wav, rate)
+    write_audio(tmp_path, wav, rate, **encoding)
+    os.replace(tmp_path, file_path)
+    return len(wav) / rate, synthesis_time
+
+
+def run_batch(rows, output_dir, workers=None, threads_per_worker=None, device="cpu", overwrite=False, backend="pytorch",
+              share_models=True, audio_format="wav", sample_rate=None, bit_depth=16):
+    """Render all pending rows and return a summary dict; workers None uses the runtime config's max_jobs"""
+    device = resolve_device(device)
+    workers = workers or get_runtime_config().max_jobs_for(device)
+    jobs = []
+    skipped = 0
+    for index, row in enumerate(rows):
+        file_path = output_path(row, index, output_dir, audio_format)
+        if not overwrite and os.path.exists(file_path):
+            skipped += 1
+            continue
+        jobs.append((row, file_path))
+
+    # Rows for the same voice next to each other keep each worker on one model
+    jobs.sort(key=lambda job: job[0]["voice"])
+
+    done = 0
+    failed = 0
+    audio_seconds = 0.0
+    synthesis_seconds = 0.0
+    start = time.perf_counter()
+
+    def record(file_path, result=None, error=None):
+        nonlocal done, failed, audio_seconds, synthesis_seconds
+        if error is not None:
+            failed += 1
+            print(f"[failed] {file_path}: {error}")
+            return
+        done += 1
+        audio_seconds += result[0]
+        synthesis_seconds += result[1]
+        print(f"[{done + failed}/{len(jobs)}] {file_path}")
+
+    if workers <= 1:
+        _init_worker(threads_per_worker, device)
+        for row, file_path in jobs:
+            try:
+                record(file_path, render_row(row, file_path, device, backend, sample_rate, bit_depth))
+            except Exception as e:
+                record(file_path, error=e)
+    else:
+        # Several processes share the cores, so keep each one from oversubscribing them
+        threads_per_worker = threads_per_worker or get_runtime_config().threads_for("cpu", jobs=workers)
+        if share_models and can_share_models(device):
+            # Load every model once here, then fork workers that share the weights
+            models = sorted({row_model(row, backend) for row, _ in jobs})
+            farm = WorkerFarm(models, workers, threads_per_worker, device)
+            print(f"Loaded {len(models)} model(s) once, shared by {workers} forked workers")
+        else:
+            farm = None
+        # Workers that load their own models are spawned, not forked: resolving the
+        # device may already have initialized CUDA here, and CUDA does not survive a fork
+        executor = farm.executor if farm else ProcessPoolExecutor(max_workers=workers,
+                                                                  mp_context=multiprocessing.get_context("spawn"),
+                                                                  initializer=_init_worker,
+                                                                  initargs=(threads_per_worker, device))
+        with executor:
+            futures = {executor.submit(render_row, row, file_path, device, backend, sample_rate, bit_depth): file_path
+                       for row, file_path in jobs}
+            for future in as_completed(futures):
+                try:
+                    record(futures[future], future.result())
+                except Exception as e:
+                    record(futures[future], error=e)
+        if farm:
+            farm.shutdown()
+
+    wall_seconds = time.perf_counter() - start
+    return {
+        "rendered": done,
+        "skipped": skipped,
+        "failed": failed,
+        "wall_seconds": wall_seconds,
+        "audio_seconds": audio_seconds,
+        "utterances_per_second": done / wall_seconds if wall_seconds > 0 else 0.0,
+        # Compute time per second of audio for a single worker, and for the whole batch
+        "real_time_factor": synthesis_seconds / audio_seconds if audio_seconds else 0.0,
+        "batch_real_time_factor": wall_seconds / audio_seconds if audio_seconds else 0.0,
+    }
+
+
+def print_summary(summary):
+    print("\nBatch summary")
+    print("-------------")
+    print(f"Rendered:          {summary['rendered']}")
+    print(f"Skipped (exists):  {summary['skipped']}")
+    print(f"Failed:            {summary['failed']}")
+    print(f"Wall time:         {summary['wall_seconds']:.1f} s")
+    print(f"Audio produced:    {summary['audio_seconds']:.1f} s")
+    print(f"Throughput:        {summary['utterances_per_second']:.2f} utterances/s")
+    print(f"Real-time factor:  {summary['real_time_factor']:.3f} per worker, "
+          f"{summary['batch_real_time_factor']:.3f} overall")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a manifest of prompts to audio files")
+    parser.add_argument("manifest", help="CSV or JSONL manifest")
+    parser.add_argument("--output-dir", default="batch_output",
+                        help="folder for rows without an explicit output path")
+    parser.add_argument("--workers", type=int,
+                        help="worker processes (default: max_jobs of the runtime config, see runtime_config.py)")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="torch threads inside each worker (default: the cores split between the workers)")
+    parser.add_argument("--device", default="auto", help="auto (see runtime_config.py), cpu or cuda")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="render rows again even if their output exists")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch",
+                        help="runtime for the female/male voices (export first with vits_export.py)")
+    parser.add_argument("--format", choices=list(FORMATS), default="wav",
+                        help="format of rows without an explicit output path")
+    parser.add_argument("--sample-rate", type=int, help="resample the outputs to this rate")
+    parser.add_argument("--bit-depth", type=int, choices=[16, 24, 32], default=16, help="bit depth for WAV/FLAC")
+    parser.add_argument("--no-shared-models", action="store_true",
+                        help="let every worker load its own models instead of forking from a loaded parent")
+    args = parser.parse_args()
+
+    rows = read_manifest(args.manifest)
+    summary = run_batch(rows, args.output_dir, args.workers,
+                        threads_per_worker=args.threads_per_worker,
+                        device=args.device,
+                        overwrite=args.overwrite,
+                        backend=args.backend,
+                        share_models=not args.no_shared_models,
+                        audio_format=args.format,
+                        sample_rate=args.sample_rate,
+                        bit_depth=args.bit_depth)
+    print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare the pitch-shift engines by real-time factor.
+
+Uses a WAV file if one is given, otherwise a synthetic voiced signal.
+
+Example:
+    python bench_pitch_shift.py --audio sample.wav --seconds 30
+"""
+import argparse
+import time
+
+import numpy as np
+
+from pitch_shift import PITCH_SHIFT_MODES, pitch_shift
+
+
+def synthetic_voice(seconds, sr=22050):
+    """Harmonic tone with a wandering pitch, roughly speech-like"""
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    y = sum(np.sin(h * phase) / h for h in range(1, 8))
+    return (0.3 * y / np.max(np.abs(y))).astype(np.float32), sr
+
+
+def benchmark(y, sr, factors=(0.8, 1.2), repeats=3):
+    """Return rows of (mode, factor, seconds, real-time factor)"""
+    duration = len(y) / sr
+    rows = []
+    for mode in PITCH_SHIFT_MODES:
+        for factor in factors:
+            try:
+                pitch_shift(y[:sr], sr, factor, mode)  # warm-up
+            except ImportError as e:
+                print(f"Skipping {mode} mode: {e}")
+                break
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                pitch_shift(y, sr, factor, mode)
+                best = min(best, time.perf_counter() - start)
+            rows.append((mode, factor, best, best / duration))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pitch-shift engines")
+    parser.add_argument("--audio", help="WAV file to shift (default: synthetic signal)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="length of audio to process")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.audio:
+        import soundfile as sf
+        y, sr = sf.read(args.audio, dtype="float32", always_2d=True)
+        y = y.mean(axis=1)[:int(args.seconds * sr)]
+    else:
+        y, sr = synthetic_voice(args.seconds)
+
+    print(f"Audio: {len(y) / sr:.1f} s at {sr} Hz\n")
+    print(f"{'mode':<10}{'factor':>8}{'time (s)':>12}{'RTF':>10}")
+    for mode, factor, seconds, rtf in benchmark(y, sr, repeats=args.repeats):
+        print(f"{mode:<10}{factor:>8.2f}{seconds:>12.3f}{rtf:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Latency, real-time factor and memory benchmarks.
+
+Covers the three synthesis paths in this project:
+    standard  VITS voices as used by tts.py and the GUI standard tab
+    clone     XTTS cloning with cached speaker latents as used by voice_cloning.py
+    pitch     the GUI's pitch-shift post-processing (both engines)
+
+For every text length and torch thread count it reports cold and warm model
+load time, time to first audio (first sentence), real-time factor,
+throughput and peak RSS. Results can be written as JSON and compared with a
+previous run to catch regressions.
+
+Runs CPU-only. Real checkpoints are used when they are already downloaded,
+otherwise (or with --stub) a small stub model stands in so the benchmark
+also works offline.
+
+Example:
+    python benchmark.py --threads 1 4 --output bench.json
+    python benchmark.py --stub --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from model_pool import ModelPool
+from pitch_shift import PITCH_SHIFT_MODES, pitch_shift
+from result_cache import write_wav
+from speaker_cache import SpeakerCache, clone_speech
+from streaming import split_sentences, synthesize_sentence
+from stub_tts import load_stub
+from voices import TTS_MODELS
+
+PARAGRAPH = (
+    "The quick brown fox jumps over the lazy dog. "
+    "Please hold while we connect your call to the next available agent. "
+    "Your order has been shipped and should arrive within three business days. "
+    "Press one for billing, press two for technical support, or stay on the line. "
+    "Thank you for your patience, we appreciate your business. "
+)
+TEXTS = {
+    "short": "Please hold while we connect your call.",
+    "medium": PARAGRAPH,
+    "long": PARAGRAPH * 4,
+}
+
+# Metrics where a higher value is a regression, used by --compare
+LOWER_IS_BETTER = ("cold_load_s", "warm_load_s", "time_to_first_audio_s", "real_time_factor", "peak_rss_mb")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / 1024 / 1024
+
+
+def checkpoint_available(model_name):
+    """True if Coqui already has this model on disk, so no download is needed"""
+    try:
+        from TTS.utils.generic_utils import get_user_data_dir
+    except ImportError:
+        return False
+    return os.path.isdir(os.path.join(get_user_data_dir("tts"), model_name.replace("/", "--")))
+
+
+def bench_load(loader, model_name):
+    """Cold load into an empty pool, then a warm lookup of the same model"""
+    pool = ModelPool(loader=loader)
+    start = time.perf_counter()
+    tts = pool.get(model_name, "cpu")
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    pool.get(model_name, "cpu")
+    warm = time.perf_counter() - start
+    return tts, cold, warm
+
+
+def bench_synthesis(tts, text, repeats, speaker=None, speaker_wav=None, language=None, speaker_cache=None):
+    """Time to first sentence, real-time factor and throughput for one text"""
+    sample_rate = tts.synthesizer.output_sample_rate
+    kwargs = {"speaker": speaker, "speaker_wav": speaker_wav, "language": language}
+    first_audio = []
+    totals = []
+    audio_seconds = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        samples = 0
+        for index, sentence in enumerate(split_sentences(text)):
+            if speaker_wav is not None:
+                wav = clone_speech(tts, sentence, speaker_wav, language, cache=speaker_cache)
+            else:
+                wav = synthesize_sentence(tts, sentence, **kwargs)
+            if index == 0:
+                first_audio.append(time.perf_counter() - start)
+            samples += len(wav)
+        totals.append(time.perf_counter() - start)
+        audio_seconds = samples / sample_rate
+    synthesis = float(np.median(totals))
+    return {
+        "time_to_first_audio_s": float(np.median(first_audio)),
+        "synthesis_s": synthesis,
+        "audio_s": audio_seconds,
+        "real_time_factor": synthesis / audio_seconds if audio_seconds else 0.0,
+        "utterances_per_s": repeats / sum(totals),
+    }
+
+
+def bench_pitch(y, sr, repeats, factor=1.2):
+    rows = {}
+    for mode in PITCH_SHIFT_MODES:
+        try:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                pitch_shift(y, sr, factor, mode)
+                times.append(time.perf_counter() - start)
+        except ImportError:
+            continue
+        rows[mode] = float(np.median(times))
+    return rows
+
+
+def run(threads_list, text_names, repeats, force_stub):
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "cpu_count": os.cpu_count(),
+            "platform": platform.platform(),
+        },
+        "rows": [],
+    }
+    work_dir = tempfile.mkdtemp(prefix="tts_bench_")
+
+    paths = {
+        "standard": TTS_MODELS["standard"]["female"],
+        "clone": TTS_MODELS["xtts"],
+    }
+    for path, model_name in paths.items():
+        stub = force_stub or not checkpoint_available(model_name)
+        loader = load_stub if stub else None
+        tts, cold, warm = bench_load(loader, model_name)
+        print(f"{path}: {'stub model' if stub else model_name} loaded in {cold:.2f} s (warm {warm * 1000:.2f} ms)")
+
+        clone_kwargs = {}
+        if path == "clone":
+            # A synthetic reference clip and an empty speaker cache keep runs comparable
+            reference = os.path.join(work_dir, "reference.wav")
+            t = np.arange(22050 * 6) / 22050
+            write_wav(reference, 0.3 * np.sin(2 * np.pi * 150 * t) * (1 + np.sin(2 * np.pi * 3 * t)), 22050)
+            clone_kwargs = {"speaker_wav": reference, "language": "en",
+                            "speaker_cache": SpeakerCache(cache_dir=os.path.join(work_dir, "speakers"))}
+
+        for threads in threads_list:
+            torch.set_num_threads(threads)
+            for text_name in text_names:
+                metrics = bench_synthesis(tts, TEXTS[text_name], repeats, **clone_kwargs)
+                row = {"path": path, "stub": stub, "text": text_name, "threads": threads,
+                       "cold_load_s": cold, "warm_load_s": warm, **metrics,
+                       "peak_rss_mb": peak_rss_mb()}
+                results["rows"].append(row)
+                print(f"  {text_name:<7} threads={threads:<2} TTFA={metrics['time_to_first_audio_s']:.3f}s "
+                      f"RTF={metrics['real_time_factor']:.3f} "
+                      f"{metrics['utterances_per_s']:.2f} utt/s RSS={row['peak_rss_mb']:.0f} MB")
+
+                if path == "standard":
+                    wav = np.asarray(synthesize_sentence(tts, TEXTS[text_name]), dtype=np.float32)
+                    sr = tts.synthesizer.output_sample_rate
+                    for mode, seconds in bench_pitch(wav, sr, repeats).items():
+                        results["rows"].append({
+                            "path": f"pitch_{mode}", "stub": stub, "text": text_name, "threads": threads,
+                            "synthesis_s": seconds, "audio_s": len(wav) / sr,
+                            "real_time_factor": seconds / (len(wav) / sr), "peak_rss_mb": peak_rss_mb(),
+                        })
+                        print(f"  {text_name:<7} threads={threads:<2} pitch {mode}: RTF={seconds / (len(wav) / sr):.4f}")
+    return results
+
+
+def compare(results, baseline_path, tolerance=0.10):
+    """Print metrics that got worse by more than the tolerance compared to a baseline"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(row["path"], row["text"], row["threads"]): row for row in json.load(f)["rows"]}
+
+    regressions = 0
+    print(f"\nComparison with {baseline_path} (flagging changes over {tolerance:.0%})")
+    for row in results["rows"]:
+        old = baseline.get((row["path"], row["text"], row["threads"]))
+        if old is None:
+            continue
+        for metric in LOWER_IS_BETTER:
+            if metric in row and old.get(metric):
+                change = (row[metric] - old[metric]) / old[metric]
+                if change > tolerance:
+                    regressions += 1
+                    print(f"  REGRESSION {row['path']}/{row['text']}/t{row['threads']} {metric}: "
+                          f"{old[metric]:.4f} -> {row[metric]:.4f} ({change:+.0%})")
+    if not regressions:
+        print("  no regressions")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark synthesis latency, RTF and memory")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="torch thread counts to test")
+    parser.add_argument("--texts", nargs="+", choices=list(TEXTS), default=list(TEXTS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="always use the stub models")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    args = parser.parse_args()
+
+    results = run(sorted(set(args.threads)), args.texts, args.repeats, args.stub)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare) else 0)
+
+
+if __name__ == "__main__":
+    main()
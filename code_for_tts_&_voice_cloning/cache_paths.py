@@ -0,0 +1,22 @@
+"""Where the on-disk caches live.
+
+Every cache (speaker latents, results, segments, prepared reference clips,
+the frontend logs, exported models, profiles, ...) gets a directory under
+~/.cache/tts_voice_cloning, which its own environment variable can move.
+"""
+import os
+import re
+
+CACHE_ROOT = os.path.join(os.path.expanduser("~"), ".cache", "tts_voice_cloning")
+
+
+def cache_dir(name, env_var=None):
+    """~/.cache/tts_voice_cloning/<name>, or the value of env_var when it is set (even to "")"""
+    if env_var is not None and env_var in os.environ:
+        return os.environ[env_var]
+    return os.path.join(CACHE_ROOT, name)
+
+
+def safe_filename(name):
+    """name with everything but letters, digits, '_', '.' and '-' replaced by '_'"""
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
@@ -0,0 +1,194 @@
+"""Long-text synthesis: split into bounded chunks, render them, crossfade.
+
+The models get slower and hungrier with input length and XTTS truncates
+anything over its per-language limit, so long inputs are cut into sentences,
+and sentences that are still too long into clauses or word runs. Chunks are
+rendered in order and stitched back together with short crossfades. At most
+a few chunks are in flight at once and the stitcher only holds back one
+crossfade's worth of samples, so memory stays bounded and time grows
+linearly with the text.
+
+Coqui models are not thread-safe, so inference on one model instance is
+serialized (runtime_config.model_lock) and by default the chunks of one text
+run one after another, with torch's intra-op threads spreading each chunk
+over the cores. With workers > 1 the chunks run in parallel in that many
+forked processes that share the model's weights (see worker_farm.py); that
+needs a CPU model from the model pool and a platform with fork.
+"""
+import functools
+import re
+from collections import deque
+
+import numpy as np
+
+from model_pool import get_pool
+from profiling import single_threaded
+from streaming import split_sentences, synthesize_sentence
+from worker_farm import WorkerFarm, can_share_models
+
+# Characters per chunk, per language. These are XTTS v2's own limits (about
+# 400 tokens); languages with dense scripts get much less text per token.
+CHAR_LIMITS = {
+    "en": 250, "es": 239, "fr": 273, "de": 253, "it": 213, "pt": 203, "pl": 224,
+    "tr": 226, "ru": 182, "nl": 251, "cs": 186, "ar": 166, "zh-cn": 82, "ko": 95,
+    "hi": 150, "hu": 224, "ja": 71,
+}
+DEFAULT_CHAR_LIMIT = 200
+DEFAULT_CROSSFADE_MS = 10
+
+# Clause boundaries, used when a single sentence is over the limit
+CLAUSE_END = re.compile(r"(?<=[,;:，；：、])\s*")
+
+
+def char_limit(language):
+    return CHAR_LIMITS.get(language or "en", DEFAULT_CHAR_LIMIT)
+
+
+def _pack(pieces, limit, separator=" "):
+    """Greedily join pieces into chunks of at most limit characters"""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if current and len(candidate) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _split_long(sentence, limit):
+    """Cut a sentence that is over the limit at clauses, then words, then characters"""
+    chunks = []
+    for clause in _pack([c for c in CLAUSE_END.split(sentence) if c], limit):
+        for run in _pack(clause.split(), limit):
+            # Only a run without spaces (one huge word, or Chinese/Japanese text) is still over the limit
+            chunks.extend(run[i:i + limit] for i in range(0, len(run), limit))
+    return chunks
+
+
+def split_text(text, language="en", max_chars=None):
+    """Split text into chunks that each fit the model's budget for the language"""
+    limit = max_chars or char_limit(language)
+    chunks = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= limit:
+            chunks.append(sentence)
+        else:
+            chunks.extend(_split_long(sentence, limit))
+    return chunks
+
+
+def synthesize_chunks(synthesize, chunks, farm=None):
+    """Yield synthesize(chunk) for every chunk in order, in the farm's worker processes if one is given.
+
+    Only about two chunks per worker are queued ahead, so a chapter never sits
+    in memory as a list of pending results.
+    """
+    if farm is None:
+        for chunk in chunks:
+            yield synthesize(chunk)
+        return
+
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(farm.submit(synthesize, chunk))
+            if len(pending) >= farm.workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Stopped early (error or generator closed): drop work not started yet
+        for future in pending:
+            future.cancel()
+
+
+def _synthesize_in_worker(key, chunk, speaker=None, speaker_wav=None, language=None):
+    """Farm task: one chunk on the worker's copy of a model the parent loaded under key"""
+    tts = get_pool().get(*key)
+    return synthesize_sentence(tts, chunk, speaker=speaker, speaker_wav=speaker_wav, language=language)
+
+
+def chunk_farm(tts, workers):
+    """WorkerFarm of forked processes sharing tts, which must be a CPU model from the pool"""
+    key = get_pool().key_of(tts)
+    if key is None or not can_share_models(key[1]):
+        raise ValueError("Parallel chunk workers need a CPU model from the model pool and fork")
+    return WorkerFarm([(key[0], key[2])], workers)
+
+
+def crossfade_stitch(waves, sample_rate, crossfade_ms=DEFAULT_CROSSFADE_MS):
+    """Join waveforms with linear crossfades, yielding finished blocks as they are ready"""
+    overlap = int(sample_rate * crossfade_ms / 1000)
+    tail = np.zeros(0, dtype=np.float32)
+    for wav in waves:
+        wav = np.asarray(wav, dtype=np.float32)
+        n = min(len(tail), len(wav), overlap)
+        if n:
+            fade_in = np.linspace(0.0, 1.0, n, dtype=np.float32)
+            mixed = tail[len(tail) - n:] * (1.0 - fade_in) + wav[:n] * fade_in
+            if len(tail) > n:
+                yield tail[:len(tail) - n]
+            wav = np.concatenate([mixed, wav[n:]])
+        elif len(tail):
+            yield tail
+        # Hold back the end of this chunk to fade it into the next one
+        if len(wav) > overlap:
+            yield wav[:len(wav) - overlap]
+            tail = wav[len(wav) - overlap:]
+        else:
+            tail = wav
+    if len(tail):
+        yield tail
+
+
+def crossfade_concat(waves, sample_rate, crossfade_ms=DEFAULT_CROSSFADE_MS):
+    blocks = list(crossfade_stitch(waves, sample_rate, crossfade_ms))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def stream_long_text(tts, text, speaker=None, speaker_wav=None, language=None, workers=1,
+                     crossfade_ms=DEFAULT_CROSSFADE_MS):
+    """Yield the stitched waveform of an arbitrarily long text block by block"""
+    if speaker_wav is not None:
+        # Compute the speaker latents once, before the first chunk needs them (and before forking)
+        from speaker_cache import get_speaker_cache
+        get_speaker_cache().get_latents(tts.synthesizer.tts_model, speaker_wav)
+    chunks = split_text(text, language or "en")
+    sample_rate = tts.synthesizer.output_sample_rate
+    # cProfile only sees this process, so profiled runs stay in it
+    if workers <= 1 or len(chunks) <= 1 or single_threaded():
+        synthesize = functools.partial(synthesize_sentence, tts, speaker=speaker,
+                                       speaker_wav=speaker_wav, language=language)
+        yield from crossfade_stitch(synthesize_chunks(synthesize, chunks), sample_rate, crossfade_ms)
+        return
+
+    with chunk_farm(tts, min(workers, len(chunks))) as farm:
+        synthesize = functools.partial(_synthesize_in_worker, get_pool().key_of(tts), speaker=speaker,
+                                       speaker_wav=speaker_wav, language=language)
+        yield from crossfade_stitch(synthesize_chunks(synthesize, chunks, farm), sample_rate, crossfade_ms)
+
+
+def render_long_text(tts, text, speaker=None, speaker_wav=None, language=None, workers=1,
+                     crossfade_ms=DEFAULT_CROSSFADE_MS):
+    """Synthesize text of any length into one float32 waveform"""
+    blocks = list(stream_long_text(tts, text, speaker=speaker, speaker_wav=speaker_wav,
+                                   language=language, workers=workers, crossfade_ms=crossfade_ms))
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def render_long_text_to_file(tts, text, path, speaker=None, speaker_wav=None, language=None, workers=1,
+                             crossfade_ms=DEFAULT_CROSSFADE_MS, target_rate=None, bit_depth=16):
+    """Write text of any length to a WAV/FLAC/OGG/Opus/MP3 file without holding the whole waveform in memory"""
+    from audio_output import StreamEncoder
+
+    with StreamEncoder(path, tts.synthesizer.output_sample_rate, target_rate=target_rate,
+                       bit_depth=bit_depth) as encoder:
+        for block in stream_long_text(tts, text, speaker=speaker, speaker_wav=speaker_wav,
+                                      language=language, workers=workers, crossfade_ms=crossfade_ms):
+            encoder.write(block)
+    return encoder.seconds
@@ -0,0 +1,171 @@
+"""CPU performance mode: int8 dynamic quantization and thread tuning.
+
+Models loaded on CPU can have their nn.Linear layers replaced by dynamically
+quantized int8 versions (weights stored as int8, activations quantized on the
+fly). Convolutions stay fp32 because dynamic quantization does not cover them,
+and neither do the GPT-2 blocks inside XTTS (they use transformers' Conv1D),
+so the gain depends on the model: measure speed and quality with this module
+before turning it on.
+
+The mode is off by default. Set TTS_QUANTIZE=1 to quantize every model the
+pool loads on CPU, and TTS_THREADS / TTS_INTEROP_THREADS to fix torch's
+intra-op and inter-op thread counts.
+
+Running this module compares fp32 and int8 for speed and output quality:
+    python cpu_mode.py --voice female --threads 4
+    python cpu_mode.py --voice clone --speaker-wav me.wav
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from streaming import split_sentences, synthesize_sentence
+
+QUANTIZE = os.environ.get("TTS_QUANTIZE", "0") == "1"
+THREADS = int(os.environ.get("TTS_THREADS", "0")) or None
+INTEROP_THREADS = int(os.environ.get("TTS_INTEROP_THREADS", "0")) or None
+
+_interop_configured = False
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """Set torch's intra-op and inter-op thread counts (None keeps torch's default)"""
+    global _interop_configured
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    # Inter-op threads can only be set once, before any parallel work has started
+    if interop_threads and not _interop_configured:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            pass
+        _interop_configured = True
+
+
+def quantize_model(tts):
+    """Swap the linear layers of a CPU model for int8 dynamic ones, returns how many were swapped"""
+    import torch
+    from torch import nn
+    from torch.ao.quantization import quantize_dynamic
+
+    synthesizer = tts.synthesizer
+    swapped = 0
+    for attribute in ("tts_model", "vocoder_model"):
+        module = getattr(synthesizer, attribute, None)
+        if module is None:
+            continue
+        linear_layers = sum(isinstance(m, nn.Linear) for m in module.modules())
+        if not linear_layers:
+            continue
+        # In place, so references held elsewhere (e.g. the XTTS inference helpers) see the new layers
+        quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8, inplace=True)
+        swapped += linear_layers
+    tts.quantized = True
+    return swapped
+
+
+def apply_cpu_mode(tts, quantize=QUANTIZE, threads=THREADS, interop_threads=INTEROP_THREADS):
+    """Apply the configured CPU settings to a freshly loaded CPU model"""
+    configure_threads(threads, interop_threads)
+    if quantize and not getattr(tts, "quantized", False):
+        quantize_model(tts)
+    return tts
+
+
+def spectral_distance(reference, test, sample_rate, n_fft=1024, hop=256):
+    """Log-spectral distance in dB between two waveforms, over their common length"""
+    from scipy.signal import stft
+    length = min(len(reference), len(test))
+    if length < n_fft:
+        return float("nan")
+    _, _, ref = stft(reference[:length], fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop)
+    _, _, out = stft(test[:length], fs=sample_rate, nperseg=n_fft, noverlap=n_fft - hop)
+    ref_db = 20 * np.log10(np.abs(ref) + 1e-5)
+    out_db = 20 * np.log10(np.abs(out) + 1e-5)
+    return float(np.mean(np.sqrt(np.mean((ref_db - out_db) ** 2, axis=0))))
+
+
+def render_seeded(tts, text, seed=0, **voice):
+    """Render text with a fixed seed, so the sampling in VITS/XTTS does not hide real differences"""
+    import torch
+    torch.manual_seed(seed)
+    return np.concatenate([synthesize_sentence(tts, sentence, **voice) for sentence in split_sentences(text)])
+
+
+def compare(fp32_tts, int8_tts, texts, repeats=3, **voice):
+    """Time both models on the same texts and measure how far int8 drifts from fp32"""
+    sample_rate = fp32_tts.synthesizer.output_sample_rate
+    rows = []
+    for text in texts:
+        timings = {}
+        outputs = {}
+        for name, tts in (("fp32", fp32_tts), ("int8", int8_tts)):
+            render_seeded(tts, text, **voice)  # warm-up
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                outputs[name] = render_seeded(tts, text, **voice)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = best
+        audio_seconds = len(outputs["fp32"]) / sample_rate
+        rows.append({
+            "chars": len(text),
+            "fp32_rtf": timings["fp32"] / audio_seconds,
+            "int8_rtf": timings["int8"] / audio_seconds,
+            "speedup": timings["fp32"] / timings["int8"],
+            "spectral_distance_db": spectral_distance(outputs["fp32"], outputs["int8"], sample_rate),
+            "length_ratio": len(outputs["int8"]) / len(outputs["fp32"]),
+        })
+    return rows
+
+
+def main():
+    from model_pool import ModelPool
+    from voices import VOICES, model_for_voice
+
+    parser = argparse.ArgumentParser(description="Compare fp32 and int8 CPU inference")
+    parser.add_argument("--voice", choices=VOICES, default="female")
+    parser.add_argument("--speaker-wav", help="reference sample for the clone voice")
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--interop-threads", type=int, default=INTEROP_THREADS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--stub", action="store_true", help="offline stub model (no linear layers, only checks the plumbing)")
+    args = parser.parse_args()
+    if args.voice == "clone" and not args.speaker_wav:
+        parser.error("--speaker-wav is required for the clone voice")
+
+    configure_threads(args.threads, args.interop_threads)
+    model_name = model_for_voice(args.voice)
+    loader = None
+    if args.stub:
+        from stub_tts import load_stub
+        loader = load_stub
+    # Two separate pools, so the fp32 and int8 copies are loaded independently
+    fp32_tts = ModelPool(loader=loader, cpu_mode=False).get(model_name, "cpu")
+    int8_tts = ModelPool(loader=loader, cpu_mode=False).get(model_name, "cpu")
+    print(f"Quantized {quantize_model(int8_tts)} linear layers of {model_name}")
+
+    voice = {}
+    if args.voice == "male":
+        voice["speaker"] = "p226"
+    elif args.voice == "clone":
+        voice = {"speaker_wav": args.speaker_wav, "language": "en"}
+    texts = [
+        "Please hold while we connect your call.",
+        "Your order has been shipped and should arrive within three business days. "
+        "Thank you for your patience, we appreciate your business.",
+    ]
+
+    import torch
+    print(f"torch threads: {torch.get_num_threads()} intra-op, {torch.get_num_interop_threads()} inter-op\n")
+    print(f"{'chars':>6}{'fp32 RTF':>10}{'int8 RTF':>10}{'speedup':>9}{'LSD (dB)':>10}{'length':>8}")
+    for row in compare(fp32_tts, int8_tts, texts, repeats=args.repeats, **voice):
+        print(f"{row['chars']:>6}{row['fp32_rtf']:>10.3f}{row['int8_rtf']:>10.3f}{row['speedup']:>8.2f}x"
+              f"{row['spectral_distance_db']:>10.2f}{row['length_ratio']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Narrate text and Markdown documents with incremental re-rendering.
+
+A document is split into paragraphs and every paragraph is rendered to its
+own cached segment, keyed by the hash of its text and the voice settings.
+When the document is edited and rendered again only the changed paragraphs
+are synthesized; the rest come from the segment cache. The segments are then
+joined with a short pause into the final narration.
+
+Segments are kept in their own cache (separate from the prompt cache) so that
+a long book is not evicted by everyday use.
+
+Example:
+    python document.py chapter1.md --output chapter1.wav --voice male
+    python document.py chapter1.md --output chapter1.wav --voice clone --speaker-wav me.wav --language de
+"""
+import argparse
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from chunking import render_long_text
+from pitch_shift import PITCH_SHIFT_MODES, pitch_shift
+from audio_output import write_audio
+from cache_paths import cache_dir
+from result_cache import ResultCache, cache_key
+from voices import BACKENDS, VOICES, model_for_voice
+
+DEFAULT_SEGMENT_DIR = cache_dir("segments", "TTS_SEGMENT_CACHE_DIR")
+# Size limit for cached paragraphs in megabytes (override with TTS_SEGMENT_CACHE_MB)
+DEFAULT_SEGMENT_MB = int(os.environ.get("TTS_SEGMENT_CACHE_MB", "4096"))
+# Silence between paragraphs
+PARAGRAPH_PAUSE_S = 0.6
+DEFAULT_MALE_SPEAKER = "p226"
+
+# Markdown markup that should not be read out
+MARKDOWN_RULES = [
+    (re.compile(r"^```.*?^```[ \t]*$", re.MULTILINE | re.DOTALL), ""),  # code blocks
+    (re.compile(r"<!--.*?-->", re.DOTALL), ""),  # comments
+    (re.compile(r"!\[[^\]]*\]\([^)]*\)"), ""),  # images
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),  # links keep their text
+    (re.compile(r"^[ \t]{0,3}#{1,6}[ \t]*(.*?)[ \t]*#*[ \t]*$", re.MULTILINE), r"\1."),  # headings read as sentences
+    (re.compile(r"^[ \t]{0,3}(?:[-*+]|\d+[.)])[ \t]+", re.MULTILINE), ""),  # list markers
+    (re.compile(r"^[ \t]{0,3}>[ \t]?", re.MULTILINE), ""),  # block quotes
+    (re.compile(r"^[ \t]{0,3}(?:[-*_][ \t]*){3,}$", re.MULTILINE), ""),  # horizontal rules
+    (re.compile(r"(\*\*|__|\*|_|`)(\S(?:.*?\S)?)\1"), r"\2"),  # emphasis and inline code
+]
+
+
+def markdown_to_text(text):
+    """Strip Markdown markup, keeping the words and the paragraph breaks"""
+    for pattern, replacement in MARKDOWN_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def split_paragraphs(text):
+    """Blank-line separated paragraphs, with wrapped lines joined"""
+    paragraphs = []
+    for block in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(line.strip() for line in block.splitlines() if line.strip())
+        # A lone heading turned into "." by markdown_to_text has nothing to say
+        if paragraph.strip(" ."):
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def read_document(path):
+    """Paragraphs of a .txt or .md file"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if os.path.splitext(path)[1].lower() in (".md", ".markdown"):
+        text = markdown_to_text(text)
+    return split_paragraphs(text)
+
+
+class DocumentRenderer:
+    """Renders paragraphs through the segment cache, synthesizing only missing ones"""
+
+    def __init__(self, model_name, get_model, speaker=None, speaker_wav=None, language=None,
+                 pitch_factor=1.0, pitch_mode="quality", cache=None, backend="pytorch", device=None):
+        self.model_name = model_name
+        self.backend = backend  # backend and device of get_model(), they are part of the cache keys
+        self.device = device
+        self.get_model = get_model  # called only if some paragraph has to be synthesized
+        self.speaker = speaker
+        self.speaker_wav = speaker_wav
+        self.language = language
+        self.pitch_factor = pitch_factor
+        self.pitch_mode = pitch_mode
+        self.cache = cache or get_segment_cache()
+        self.rendered = 0
+        self.reused = 0
+
+    @property
+    def shift_pitch(self):
+        return abs(self.pitch_factor - 1.0) > 0.01
+
+    def segment(self, paragraph):
+        """Return (unshifted wav, output wav, sample rate) for one paragraph"""
+        base_key = cache_key(self.model_name, paragraph, speaker=self.speaker,
+                             speaker_wav=self.speaker_wav, language=self.language,
+                             backend=self.backend, device=self.device)
+        base = self.cache.get(base_key)
+        if base is None:
+            tts = self.get_model()
+            wav = render_long_text(tts, paragraph, speaker=self.speaker, speaker_wav=self.speaker_wav,
+                                   language=self.language)
+            base = wav, tts.synthesizer.output_sample_rate
+            self.cache.put(base_key, *base)
+            self.rendered += 1
+        else:
+            self.reused += 1
+        original, sample_rate = base
+        if not self.shift_pitch:
+            return original, original, sample_rate
+
+        # The shifted segment is cached too, the unshifted one makes a new pitch cheap
+        key = cache_key(self.model_name, paragraph, speaker=self.speaker, speaker_wav=self.speaker_wav,
+                        language=self.language, pitch_factor=self.pitch_factor, pitch_mode=self.pitch_mode,
+                        backend=self.backend, device=self.device)
+        shifted = self.cache.get(key)
+        if shifted is None:
+            shifted = pitch_shift(original, sample_rate, self.pitch_factor, mode=self.pitch_mode), sample_rate
+            self.cache.put(key, *shifted)
+        return original, shifted[0], sample_rate
+
+    def render(self, paragraphs, on_progress=None, check_cancelled=None):
+        """Return (unshifted wav, output wav, sample rate) for the whole document"""
+        originals = []
+        outputs = []
+        sample_rate = None
+        for index, paragraph in enumerate(paragraphs):
+            if check_cancelled is not None:
+                check_cancelled()
+            original, output, sample_rate = self.segment(paragraph)
+            if originals:
+                pause = np.zeros(int(PARAGRAPH_PAUSE_S * sample_rate), dtype=np.float32)
+                originals.append(pause)
+                outputs.append(pause)
+            originals.append(np.asarray(original, dtype=np.float32))
+            outputs.append(np.asarray(output, dtype=np.float32))
+            if on_progress is not None:
+                on_progress(index + 1, len(paragraphs))
+        if not originals:
+            raise ValueError("The document has no text to read")
+        original = np.concatenate(originals)
+        output = np.concatenate(outputs) if self.shift_pitch else original
+        return original, output, sample_rate
+
+
+_default_segment_cache = None
+_default_segment_cache_lock = threading.Lock()
+
+
+def get_segment_cache():
+    global _default_segment_cache
+    with _default_segment_cache_lock:
+        if _default_segment_cache is None:
+            _default_segment_cache = ResultCache(DEFAULT_SEGMENT_DIR, DEFAULT_SEGMENT_MB)
+        return _default_segment_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Narrate a text or Markdown file, re-rendering only changed paragraphs")
+    parser.add_argument("document", help=".txt or .md file")
+    parser.add_argument("--output", help="output file, .wav/.flac/.ogg/.opus/.mp3 (default: document name with .wav)")
+    parser.add_argument("--voice", choices=VOICES, default="female")
+    parser.add_argument("--speaker", help=f"VCTK speaker for the male voice (default: {DEFAULT_MALE_SPEAKER})")
+    parser.add_argument("--speaker-wav", help="reference sample for the clone voice")
+    parser.add_argument("--language", default="en", help="language for the clone voice")
+    parser.add_argument("--pitch", type=float, default=1.0, help="pitch factor, 0.5 - 2.0")
+    parser.add_argument("--pitch-mode", choices=PITCH_SHIFT_MODES, default="quality")
+    parser.add_argument("--device", default="auto", help="auto, cpu or cuda")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch",
+                        help="runtime for the female/male voices (export first with vits_export.py)")
+    args = parser.parse_args()
+    if args.voice == "clone" and not args.speaker_wav:
+        parser.error("--speaker-wav is required for the clone voice")
+
+    from model_pool import get_pool
+
+    model_name = model_for_voice(args.voice)
+    backend = args.backend if args.voice != "clone" else "pytorch"
+    renderer = DocumentRenderer(
+        model_name,
+        lambda: get_pool().get(model_name, args.device, backend),
+        speaker=(args.speaker or DEFAULT_MALE_SPEAKER) if args.voice == "male" else None,
+        speaker_wav=args.speaker_wav if args.voice == "clone" else None,
+        language=args.language if args.voice == "clone" else None,
+        pitch_factor=args.pitch,
+        pitch_mode=args.pitch_mode,
+        backend=backend,
+        device=args.device,
+    )
+    paragraphs = read_document(args.document)
+    start = time.perf_counter()
+    _, output, sample_rate = renderer.render(
+        paragraphs, on_progress=lambda done, total: print(f"\rParagraph {done}/{total}", end="", flush=True))
+    output_path = args.output or os.path.splitext(args.document)[0] + ".wav"
+    write_audio(output_path, output, sample_rate)
+    print(f"\n{renderer.rendered} paragraphs synthesized, {renderer.reused} reused from cache "
+          f"in {time.perf_counter() - start:.1f} s")
+    print(f"Audio saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
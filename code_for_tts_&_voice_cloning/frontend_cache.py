@@ -0,0 +1,174 @@
+"""Memoized text frontend (cleaning, number expansion, phonemization).
+
+Before a VITS model sees a sentence, its tokenizer cleans the text, expands
+numbers and abbreviations, phonemizes it and maps the phonemes to ids. Our
+prompts share most of their sentences, and for short IVR prompts that work
+is a noticeable part of the CPU time. install() wraps a model's tokenizer so
+the token ids of every (model, language, sentence) are computed once and then
+served from a bounded LRU. New entries are also appended to a small log per
+model on disk, so they survive restarts.
+
+The model pool installs the cache on every model it loads. It applies to the
+VITS voices (PyTorch and exported); XTTS tokenizes with its own BPE tokenizer,
+which is cheap and is left alone.
+
+TTS_FRONTEND_CACHE=0 turns it off, TTS_FRONTEND_CACHE_ENTRIES bounds the LRU,
+TTS_FRONTEND_CACHE_DIR moves the logs (set it to an empty string to keep the
+cache in memory only).
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cache_paths import cache_dir, safe_filename
+from profiling import span
+
+ENABLED = os.environ.get("TTS_FRONTEND_CACHE", "1") != "0"
+DEFAULT_MAX_ENTRIES = int(os.environ.get("TTS_FRONTEND_CACHE_ENTRIES", "20000"))
+DEFAULT_CACHE_DIR = cache_dir("frontend", "TTS_FRONTEND_CACHE_DIR")
+
+# Frontend seconds spent by each thread, so callers can split their own timings
+_thread_clock = threading.local()
+
+
+def thread_seconds():
+    """Frontend time spent so far on the calling thread (hits and misses)"""
+    return getattr(_thread_clock, "seconds", 0.0)
+
+
+class FrontendCache:
+    """LRU of token ids keyed by (model, language, text), with an append-only log per model"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir or None
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0  # total frontend time, all threads
+        self._entries = OrderedDict()  # (model, language, text) -> tuple of token ids
+        self._loaded_models = set()
+        self._lock = threading.Lock()
+
+    def token_ids(self, model_name, text_to_ids, text, language=None):
+        """text_to_ids(text, language) for a sentence, computed once per model and language"""
+        start = time.perf_counter()
+        key = (model_name, _language_key(language), text)
+        with self._lock:
+            self._load(model_name)
+            ids = self._entries.get(key)
+            if ids is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if ids is None:
+            with span("phonemize", chars=len(text)):
+                ids = tuple(int(i) for i in text_to_ids(text, language=language))
+            with self._lock:
+                self.misses += 1
+                self._put(key, ids)
+                self._append(key, ids)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.seconds += elapsed
+        _thread_clock.seconds = thread_seconds() + elapsed
+        return list(ids)
+
+    def stats_text(self):
+        total = self.hits + self.misses
+        rate = 100 * self.hits / total if total else 0.0
+        return (f"frontend cache: {self.hits}/{total} hits ({rate:.0f}%), "
+                f"{self.seconds * 1000:.1f} ms in the text frontend")
+
+    def _put(self, key, ids):
+        self._entries[key] = ids
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _log_path(self, model_name):
+        return os.path.join(self.cache_dir, safe_filename(model_name) + ".jsonl")
+
+    def _load(self, model_name):
+        """Read a model's log the first time the model is used"""
+        if model_name in self._loaded_models or self.cache_dir is None:
+            return
+        self._loaded_models.add(model_name)
+        path = self._log_path(model_name)
+        try:
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                language, text, ids = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            self._put((model_name, language, text), tuple(ids))
+        if len(lines) > 2 * self.max_entries:
+            # Rewrite the log with the entries that are still in the LRU
+            self._compact(model_name, path)
+
+    def _compact(self, model_name, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for (model, language, text), ids in self._entries.items():
+                if model == model_name:
+                    f.write(json.dumps([language, text, list(ids)], ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+    def _append(self, key, ids):
+        if self.cache_dir is None:
+            return
+        model_name, language, text = key
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._log_path(model_name), "a", encoding="utf-8") as f:
+                f.write(json.dumps([language, text, list(ids)], ensure_ascii=False) + "\n")
+        except OSError:
+            pass  # persistence is best effort, the in-memory entry is enough
+
+
+def _language_key(language):
+    # Coqui passes language ids or names; both end up as JSON strings on disk
+    return None if language is None else str(language)
+
+
+def find_tokenizer(tts):
+    """The Coqui TTSTokenizer behind a model, or None if it has no phoneme frontend"""
+    tokenizer = getattr(tts, "tokenizer", None)  # exported models (vits_export.py)
+    if tokenizer is None:
+        model = getattr(tts.synthesizer, "tts_model", None)
+        tokenizer = getattr(model, "tokenizer", None)
+    return tokenizer if hasattr(tokenizer, "text_to_ids") else None
+
+
+def install(tts, model_name, cache=None):
+    """Route a model's text_to_ids through the frontend cache; returns True if it was installed"""
+    if not ENABLED:
+        return False
+    tokenizer = find_tokenizer(tts)
+    if tokenizer is None or getattr(tokenizer, "frontend_cache", None) is not None:
+        return False
+    cache = cache or get_frontend_cache()
+    text_to_ids = tokenizer.text_to_ids
+
+    def cached_text_to_ids(text, language=None):
+        return cache.token_ids(model_name, text_to_ids, text, language)
+
+    tokenizer.text_to_ids = cached_text_to_ids
+    tokenizer.frontend_cache = cache
+    return True
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_frontend_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FrontendCache()
+        return _default_cache
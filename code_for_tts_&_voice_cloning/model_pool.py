@@ -0,0 +1,183 @@
+"""Shared pool of loaded Coqui TTS models.
+
+Loading a checkpoint takes several seconds for VITS and much longer for
+XTTS v2, so each model is loaded once per (model name, device) and kept warm.
+When the estimated size of the resident models goes over the memory budget
+the least recently used model is evicted. A model being loaded only blocks
+callers that want that same model; lookups of warm models never wait for it.
+"""
+import contextlib
+import functools
+import gc
+import os
+import threading
+import sys
+from collections import OrderedDict
+
+from frontend_cache import install as install_frontend_cache
+from profiling import span
+from runtime_config import get_runtime_config, resolve_device
+
+# torch and TTS are imported on first load, so importing this module stays cheap
+# Memory budget for resident models in megabytes (override with TTS_MODEL_MEMORY_MB)
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get("TTS_MODEL_MEMORY_MB", "4096"))
+
+
+@contextlib.contextmanager
+def allow_full_checkpoint_load():
+    """Force torch.load(weights_only=False) while loading XTTS checkpoints"""
+    import torch
+    original_torch_load = torch.load
+
+    # Create a wrapper that forces weights_only=False
+    # to bypass the security check at source of the checkpoint
+    @functools.wraps(original_torch_load)
+    def patched_torch_load(*args, **kwargs):
+        kwargs['weights_only'] = False
+        return original_torch_load(*args, **kwargs)
+
+    torch.load = patched_torch_load
+    try:
+        yield
+    finally:
+        # Restore the original torch.load function
+        torch.load = original_torch_load
+
+
+def estimate_model_size_mb(tts):
+    """Rough memory footprint of a loaded model, from its parameters and buffers"""
+    # Exported models know the size of their artifact instead
+    if getattr(tts, "size_mb", None) is not None:
+        return tts.size_mb
+    total_bytes = 0
+    synthesizer = getattr(tts, "synthesizer", None)
+    for module in (getattr(synthesizer, "tts_model", None), getattr(synthesizer, "vocoder_model", None)):
+        if module is None:
+            continue
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total_bytes += tensor.numel() * tensor.element_size()
+    return total_bytes / (1024 * 1024)
+
+
+class ModelPool:
+    """Loads each model once and keeps it resident, evicting by LRU"""
+
+    def __init__(self, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, loader=None, cpu_mode=True):
+        self.memory_budget_mb = memory_budget_mb
+        # Apply the TTS_QUANTIZE settings to models loaded on CPU
+        self.cpu_mode = cpu_mode
+        # loader(model_name, device) -> TTS; defaults to loading Coqui checkpoints
+        self.loader = loader or self._load
+        self._models = OrderedDict()  # (model_name, device, backend) -> (tts, size_mb)
+        self._loading = {}  # (model_name, device, backend) -> lock held while that model loads
+        self._lock = threading.RLock()
+
+    def get(self, model_name, device=None, backend="pytorch"):
+        """Return a warm model, loading it on first use; device None or "auto" uses the runtime config"""
+        device = resolve_device(device)
+        key = (model_name, device, backend)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Only callers of this model wait for the load, the pool lock stays free for the others
+        with loading:
+            with self._lock:
+                if key in self._models:
+                    # Loaded by another thread while this one waited
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            # A span in profiled requests, so a reload on the hot path is easy to spot
+            with span("load_checkpoint", model=model_name, device=device, backend=backend):
+                if backend == "pytorch":
+                    tts = self.loader(model_name, device)
+                else:
+                    # ONNX / TorchScript artifacts written by vits_export.py
+                    from vits_export import load_exported
+                    tts = load_exported(model_name, backend, device)
+            # Sentences seen before skip cleaning and phonemization
+            install_frontend_cache(tts, model_name)
+            size_mb = estimate_model_size_mb(tts)
+
+            with self._lock:
+                self._models[key] = (tts, size_mb)
+                # After a failed load the lock stays, so the next attempt is still one at a time
+                del self._loading[key]
+                evicted = self._evict(keep=key)
+        if evicted:
+            self._release_memory()
+        return tts
+
+    def is_loaded(self, model_name, device=None, backend="pytorch"):
+        device = resolve_device(device)
+        with self._lock:
+            return (model_name, device, backend) in self._models
+
+    def key_of(self, tts):
+        """(model_name, device, backend) that tts is loaded under, or None if it is not in the pool"""
+        with self._lock:
+            for key, (model, _) in self._models.items():
+                if model is tts:
+                    return key
+        return None
+
+    def loaded_models(self):
+        """List of (model_name, device, backend, size_mb), least recently used first"""
+        with self._lock:
+            return [(name, device, backend, size_mb)
+                    for (name, device, backend), (_, size_mb) in self._models.items()]
+
+    def memory_used_mb(self):
+        with self._lock:
+            return sum(size_mb for _, size_mb in self._models.values())
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+        self._release_memory()
+
+    def _load(self, model_name, device):
+        from TTS.api import TTS
+        # XTTS checkpoints need the torch.load security check bypassed
+        if "xtts" in model_name:
+            with allow_full_checkpoint_load():
+                tts = TTS(model_name, progress_bar=False)
+        else:
+            tts = TTS(model_name=model_name, progress_bar=False)
+        tts = tts.to(device)
+        # Thread counts for the device, plus int8 quantization on CPU if enabled
+        return get_runtime_config().apply(tts, device, cpu_mode=self.cpu_mode)
+
+    def _evict(self, keep):
+        """Drop least recently used models while over budget; returns True if any was dropped"""
+        evicted = False
+        while self.memory_used_mb() > self.memory_budget_mb and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            del self._models[oldest]
+            evicted = True
+        return evicted
+
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide model pool shared by the GUI tabs and scripts"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ModelPool()
+        return _default_pool
@@ -0,0 +1,122 @@
+"""Per-stage timing of the synthesis pipeline.
+
+Each request gets a StageTimer. Finished stages (model load, segmentation,
+model wait, frontend, inference and vocoder per sentence, post-processing,
+write) are logged as
+one JSON object per line on the "tts.metrics" logger and handed to an
+optional callback, e.g. to feed a UI queue. With a profiler attached
+(profiling.py) every stage is also a span in the request's trace.
+"""
+import contextlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger("tts.metrics")
+
+
+class StageTimer:
+    """Times the stages of one request and reports each one as it finishes"""
+
+    def __init__(self, request_id, on_event=None, profiler=None):
+        self.request_id = request_id
+        self.on_event = on_event
+        self.profiler = profiler
+        self.timings = []  # (stage, seconds)
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            with self.span(name, **fields):
+                yield
+        finally:
+            self.record(name, time.perf_counter() - start, **fields)
+
+    def span(self, name, **fields):
+        """A section that only shows up in the profile trace, not as a stage"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.span(name, **fields)
+
+    def record(self, name, seconds, **fields):
+        self.timings.append((name, seconds))
+        if self.profiler is not None:
+            self.profiler.add_stage(name, seconds)
+        self._emit({"event": "stage", "stage": name, "seconds": round(seconds, 4), **fields})
+
+    def progress(self, done, total, **fields):
+        self._emit({"event": "progress", "done": done, "total": total, **fields})
+
+    def totals(self):
+        """Seconds spent per stage name, summed over sentences"""
+        totals = {}
+        for name, seconds in self.timings:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def finish(self, **fields):
+        if self.profiler is not None:
+            self.profiler.finish()
+        self._emit({
+            "event": "summary",
+            "total_seconds": round(time.perf_counter() - self._start, 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.totals().items()},
+            **fields,
+        })
+
+    def _emit(self, record):
+        record = {"request": self.request_id, **record}
+        logger.info(json.dumps(record))
+        if self.on_event is not None:
+            self.on_event(record)
+
+
+def find_vocoder(tts):
+    """The module that turns model outputs into a waveform, if there is a separate one"""
+    synthesizer = tts.synthesizer
+    if getattr(synthesizer, "vocoder_model", None) is not None:
+        return synthesizer.vocoder_model
+    # VITS and XTTS carry their decoder inside the TTS model
+    for name in ("waveform_decoder", "hifigan_decoder"):
+        module = getattr(synthesizer.tts_model, name, None)
+        if module is not None:
+            return module
+    return None
+
+
+class VocoderClock:
+    def __init__(self):
+        self.seconds = 0.0
+        # Only forward passes on this thread count; other jobs may share the model
+        self.thread = threading.get_ident()
+
+
+@contextlib.contextmanager
+def track_vocoder_time(tts):
+    """Accumulate time spent in the vocoder's forward pass on the calling thread while the block runs"""
+    clock = VocoderClock()
+    module = find_vocoder(tts)
+    if module is None:
+        yield clock
+        return
+
+    starts = []  # only ever touched from clock.thread
+
+    def before_forward(module, inputs):
+        if threading.get_ident() == clock.thread:
+            starts.append(time.perf_counter())
+
+    def after_forward(module, inputs, outputs):
+        if threading.get_ident() == clock.thread:
+            clock.seconds += time.perf_counter() - starts.pop()
+
+    pre_handle = module.register_forward_pre_hook(before_forward)
+    post_handle = module.register_forward_hook(after_forward)
+    try:
+        yield clock
+    finally:
+        pre_handle.remove()
+        post_handle.remove()
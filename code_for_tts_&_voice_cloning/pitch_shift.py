@@ -0,0 +1,81 @@
+"""Pitch-shift engines for generated speech.
+
+"quality" is librosa's phase vocoder plus resampling, which sounds best but
+runs a full STFT over the whole clip. "fast" time-stretches with WSOLA
+(waveform similarity overlap-add) and resamples back to the original
+length, all in NumPy, and is several times faster on CPU.
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PITCH_SHIFT_MODES = ("quality", "fast")
+
+
+def resample_to_length(y, length):
+    """Linear-interpolation resampling to an exact number of samples"""
+    if len(y) == length or len(y) < 2:
+        return y
+    return np.interp(np.linspace(0, len(y) - 1, length), np.arange(len(y)), y).astype(np.float32)
+
+
+def time_stretch_wsola(y, rate, sr, frame_ms=30.0, tolerance_ms=8.0):
+    """Change duration by 1 / rate without changing pitch"""
+    y = np.asarray(y, dtype=np.float32)
+    frame = int(sr * frame_ms / 1000) // 2 * 2
+    if len(y) < frame * 2:
+        return resample_to_length(y, int(round(len(y) / rate)))
+
+    synthesis_hop = frame // 2
+    analysis_hop = synthesis_hop * rate
+    tolerance = int(sr * tolerance_ms / 1000)
+    window = np.hanning(frame).astype(np.float32)
+
+    # Padding keeps every search window and template inside the buffer
+    padded = np.pad(y, (tolerance, frame + tolerance))
+    n_frames = int((len(y) - frame) / analysis_hop) + 1
+    out = np.zeros(n_frames * synthesis_hop + frame, dtype=np.float32)
+    norm = np.zeros_like(out)
+
+    previous = 0
+    for k in range(n_frames):
+        nominal = int(round(k * analysis_hop))
+        if k == 0:
+            position = nominal
+        else:
+            # Pick the input segment that best continues the previous one
+            template = padded[tolerance + previous + synthesis_hop:
+                              tolerance + previous + synthesis_hop + frame]
+            candidates = sliding_window_view(padded[nominal:nominal + frame + 2 * tolerance], frame)
+            position = nominal - tolerance + int(np.argmax(candidates @ template))
+
+        start = k * synthesis_hop
+        out[start:start + frame] += padded[tolerance + position:tolerance + position + frame] * window
+        norm[start:start + frame] += window
+        previous = position
+
+    out /= np.maximum(norm, 1e-3)
+    return out[:int(round(len(y) / rate))]
+
+
+def pitch_shift_fast(y, sr, pitch_factor):
+    """Stretch by the pitch factor, then resample back to the original length"""
+    stretched = time_stretch_wsola(y, 1.0 / pitch_factor, sr)
+    return resample_to_length(stretched, len(y))
+
+
+def pitch_shift_quality(y, sr, pitch_factor):
+    import librosa
+    # Calculate semitones based on pitch_factor (logarithmic scale)
+    n_steps = 12 * np.log2(pitch_factor)
+    return librosa.effects.pitch_shift(y=y, sr=sr, n_steps=n_steps)
+
+
+def pitch_shift(y, sr, pitch_factor, mode="quality"):
+    """Shift pitch by a factor (1.0 = unchanged) with the chosen engine"""
+    if abs(pitch_factor - 1.0) <= 0.01:
+        return y
+    if mode == "fast":
+        return pitch_shift_fast(y, sr, pitch_factor)
+    if mode == "quality":
+        return pitch_shift_quality(y, sr, pitch_factor)
+    raise ValueError(f"Unknown pitch shift mode '{mode}', expected one of: {', '.join(PITCH_SHIFT_MODES)}")
@@ -0,0 +1,204 @@
+"""Opt-in profiling of single requests: spans, Chrome traces, cProfile and torch.profiler.
+
+A RequestProfiler collects spans (named, timed sections on any thread) while
+one request runs. When the request finishes it writes, to the profile
+directory:
+    <request>.trace.json   Chrome trace of the spans (open in chrome://tracing or Perfetto)
+    <request>.summary.txt  table of time per stage
+and, depending on the mode, a deeper profile of the same request:
+    cprofile:  <request>.prof (pstats) and the top functions in the summary
+    torch:     <request>.torch.json (torch.profiler Chrome trace) and its top operators
+
+Besides the pipeline stages, the hot-path helpers open spans of their own
+(model loads, reference-clip preparation, speaker latents, phonemization and
+every synthesized sentence), so a model reload or a resampling step that
+creeps into the request shows up by name. The profiler is active in the
+context that started it, so requests running side by side (the GUI's CPU and
+GPU workers) each get only their own spans; run_in_context() carries it over
+to helper threads. cProfile only sees the thread that started it, so while
+it runs, work that would go to helper threads stays on the request's thread
+(see single_threaded()).
+
+Profiling is off unless TTS_PROFILE is set to spans, cprofile or torch (or
+--profile is passed to tts.py / voice_cloning.py). Files go to
+~/.cache/tts_voice_cloning/profiles, or TTS_PROFILE_DIR.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from cache_paths import cache_dir, safe_filename
+
+logger = logging.getLogger("tts.profile")
+
+PROFILE_MODES = ("spans", "cprofile", "torch")
+MODE = os.environ.get("TTS_PROFILE", "") or None
+DEFAULT_PROFILE_DIR = cache_dir("profiles", "TTS_PROFILE_DIR")
+TOP_FUNCTIONS = 25
+
+# The profiler of the request running in this context; spans opened in it go there
+_active = contextvars.ContextVar("tts_profiler", default=None)
+
+
+def span(name, **args):
+    """Time a section for the active profiler; costs nothing when no request is profiled"""
+    profiler = _active.get()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.span(name, **args)
+
+
+def run_in_context(fn):
+    """Wrap fn so it runs with the caller's profiler when called on another thread"""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+def single_threaded():
+    """True while the active profiler only sees the calling thread (cProfile)"""
+    profiler = _active.get()
+    return profiler is not None and profiler._profile is not None
+
+
+def profiler_for(request_id, mode=None, profile_dir=DEFAULT_PROFILE_DIR):
+    """A started RequestProfiler if profiling is enabled (mode, else TTS_PROFILE), else None"""
+    mode = mode or MODE
+    if not mode:
+        return None
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of: {', '.join(PROFILE_MODES)}")
+    return RequestProfiler(request_id, mode, profile_dir).start()
+
+
+class RequestProfiler:
+    """Spans and an optional cProfile/torch.profiler capture for one request"""
+
+    def __init__(self, request_id, mode="spans", profile_dir=DEFAULT_PROFILE_DIR):
+        self.request_id = str(request_id)
+        self.mode = mode
+        self.profile_dir = profile_dir
+        self.events = []  # Chrome trace events
+        self.stages = {}  # stage name -> [count, seconds]
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._profile = None
+        self._torch_profile = None
+        self._token = None
+        self.finished = False
+        self.report = None  # summary text, set by finish()
+        self.base = None  # path of the written files without their extensions
+
+    def start(self):
+        if self.mode == "cprofile":
+            import cProfile
+            # cProfile follows the thread that enables it, i.e. the request's own thread
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Only one cProfile can run at a time (e.g. the other GUI worker has one)
+                logger.warning("Another profiler is running, request %s records spans only", self.request_id)
+                self._profile = None
+        elif self.mode == "torch":
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            self._torch_profile = profile(activities=activities)
+            self._torch_profile.__enter__()
+        self._origin = time.perf_counter()
+        self._token = _active.set(self)
+        return self
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        record_function = None
+        if self._torch_profile is not None:
+            # Makes the span show up in the torch.profiler trace as well
+            from torch.profiler import record_function
+            record_function = record_function(name)
+            record_function.__enter__()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if record_function is not None:
+                record_function.__exit__(None, None, None)
+            self._add_event(name, start, end, args)
+
+    def add_stage(self, name, seconds):
+        """Count time for the summary table (the pipeline's StageTimer reports its stages here)"""
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _add_event(self, name, start, end, args):
+        event = {
+            "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+            "ts": round((start - self._origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+        }
+        if args:
+            event["args"] = {key: value if isinstance(value, (int, float, bool)) else str(value)
+                             for key, value in args.items()}
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self, total_seconds):
+        """Per-stage table plus the spans that were not pipeline stages"""
+        lines = [f"Request {self.request_id}: {total_seconds:.3f} s", "",
+                 f"{'stage':<24}{'count':>7}{'total s':>10}{'mean ms':>10}{'share':>8}"]
+        rows = dict(self.stages)
+        for event in self.events:
+            if event["name"] not in self.stages:
+                entry = rows.setdefault(event["name"], [0, 0.0])
+                entry[0] += 1
+                entry[1] += event["dur"] / 1e6
+        for name, (count, seconds) in sorted(rows.items(), key=lambda item: -item[1][1]):
+            share = 100 * seconds / total_seconds if total_seconds else 0.0
+            lines.append(f"{name:<24}{count:>7}{seconds:>10.3f}{1000 * seconds / count:>10.1f}{share:>7.1f}%")
+        return "\n".join(lines)
+
+    def finish(self):
+        """Stop capturing and write the trace, the summary and the deep profile; returns the summary"""
+        if _active.get() is self:
+            try:
+                _active.reset(self._token)
+            except ValueError:
+                _active.set(None)  # finished from another context than the one that started it
+        if self.finished:
+            return None
+        self.finished = True
+        total_seconds = time.perf_counter() - self._origin
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = self.base = os.path.join(self.profile_dir, safe_filename(self.request_id))
+
+        with open(base + ".trace.json", "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+        text = self.summary(total_seconds)
+
+        if self._profile is not None:
+            import io
+            import pstats
+            self._profile.disable()
+            self._profile.dump_stats(base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            text += "\n\ncProfile, top functions by cumulative time:\n" + out.getvalue()
+        elif self._torch_profile is not None:
+            self._torch_profile.__exit__(None, None, None)
+            self._torch_profile.export_chrome_trace(base + ".torch.json")
+            table = self._torch_profile.key_averages().table(sort_by="self_cpu_time_total", row_limit=TOP_FUNCTIONS)
+            text += "\n\ntorch.profiler, top operators by self CPU time:\n" + table
+
+        with open(base + ".summary.txt", "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.info("Profile of request %s written to %s.*", self.request_id, base)
+        self.report = text
+        return text
@@ -0,0 +1,174 @@
+"""Clean up reference clips for voice cloning, once per clip.
+
+Users pick whatever they have: MP3 or WAV, stereo, 44.1 or 48 kHz, with long
+silences or minutes of audio. prepare_reference() decodes such a clip once,
+mixes it to mono, resamples it to the rate XTTS loads references at, trims
+leading/trailing silence and shortens long pauses, normalizes the loudness
+and keeps only the first seconds that conditioning actually uses (the longer
+of max_ref_len and gpt_cond_len in the XTTS config). The result is stored as
+a 16-bit WAV named after the hash of the source clip, the processing version
+and that length, so the next request for the same clip reuses it without
+decoding or resampling again.
+
+Set TTS_REFERENCE_PREPROCESS=0 to feed clips to XTTS unchanged, and
+TTS_REFERENCE_MAX_SECONDS to keep a different length than the config's.
+"""
+import os
+import threading
+from math import gcd
+
+import numpy as np
+
+from cache_paths import cache_dir
+from profiling import span
+
+DEFAULT_REFERENCE_DIR = cache_dir("references", "TTS_REFERENCE_DIR")
+ENABLED = os.environ.get("TTS_REFERENCE_PREPROCESS", "1") != "0"
+# XTTS loads conditioning audio at 22.05 kHz
+TARGET_SAMPLE_RATE = 22050
+# XTTS conditions on the first seconds of the reference; more only costs encoder time.
+# The model config says how many; this override wins, the default is XTTS v2's.
+MAX_SECONDS = float(os.environ.get("TTS_REFERENCE_MAX_SECONDS", "0")) or None
+DEFAULT_MAX_SECONDS = 30.0
+TARGET_RMS_DBFS = -20.0
+PEAK_LIMIT_DBFS = -1.0
+SILENCE_DB = -40.0  # frames this far below the loudest frame count as silence
+MAX_PAUSE_S = 0.4  # longer pauses inside the clip are shortened to this
+# Bump when the processing changes, so older prepared clips are not reused
+VERSION = 1
+
+_lock = threading.Lock()
+
+
+def decode(path):
+    """Decode any clip to (mono float32 samples, sample rate)"""
+    try:
+        import soundfile as sf
+    except ImportError:
+        sf = None
+    if sf is not None:
+        try:
+            audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+            return audio.mean(axis=1), sample_rate
+        except RuntimeError:
+            # Older libsndfile builds cannot read MP3
+            if not path.lower().endswith(".mp3"):
+                raise
+    elif path.lower().endswith(".wav"):
+        from scipy.io import wavfile
+        sample_rate, audio = wavfile.read(path)
+        if audio.dtype.kind in "iu":
+            audio = audio / float(np.iinfo(audio.dtype).max)
+        audio = audio.reshape(len(audio), -1).mean(axis=1)
+        return audio.astype(np.float32), sample_rate
+    import librosa
+    audio, sample_rate = librosa.load(path, sr=None, mono=True)
+    return audio.astype(np.float32), sample_rate
+
+
+def resample(audio, sample_rate, target_rate=TARGET_SAMPLE_RATE):
+    if sample_rate == target_rate:
+        return audio
+    from scipy.signal import resample_poly
+    divisor = gcd(int(sample_rate), int(target_rate))
+    with span("resample", source_rate=int(sample_rate), target_rate=int(target_rate)):
+        return resample_poly(audio, target_rate // divisor, int(sample_rate) // divisor).astype(np.float32)
+
+
+def frame_levels_db(audio, frame):
+    """RMS level of every frame in dB relative to full scale"""
+    frames = len(audio) // frame
+    if frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    rms = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    return 20 * np.log10(rms + 1e-9)
+
+
+def trim_silence(audio, sample_rate, silence_db=SILENCE_DB, max_pause_s=MAX_PAUSE_S, frame_ms=20):
+    """Cut leading/trailing silence and shorten long pauses"""
+    frame = int(sample_rate * frame_ms / 1000)
+    levels = frame_levels_db(audio, frame)
+    if not len(levels):
+        return audio
+    voiced = levels > levels.max() + silence_db
+    if not voiced.any():
+        return audio
+
+    max_pause_frames = max(1, int(max_pause_s * 1000 / frame_ms))
+    keep = np.zeros(len(voiced), dtype=bool)
+    first, last = np.flatnonzero(voiced)[[0, -1]]
+    keep[first:last + 1] = True
+    # Within the voiced span, drop the middle of every pause that is too long
+    run_start = None
+    for index in range(first, last + 2):
+        silent = index <= last and not voiced[index]
+        if silent and run_start is None:
+            run_start = index
+        elif not silent and run_start is not None:
+            if index - run_start > max_pause_frames:
+                half = max_pause_frames // 2
+                keep[run_start + half:index - (max_pause_frames - half)] = False
+            run_start = None
+    # A frame of margin on both ends keeps consonant onsets and decays
+    keep[max(0, first - 1)] = keep[min(len(keep) - 1, last + 1)] = True
+    return audio[:len(keep) * frame].reshape(len(keep), frame)[keep].ravel()
+
+
+def normalize_loudness(audio, target_dbfs=TARGET_RMS_DBFS, peak_dbfs=PEAK_LIMIT_DBFS):
+    """Scale to a target RMS level without letting peaks go over the limit"""
+    rms = float(np.sqrt(np.mean(audio ** 2))) if len(audio) else 0.0
+    if rms < 1e-6:
+        return audio
+    gain = 10 ** (target_dbfs / 20) / rms
+    peak = float(np.max(np.abs(audio))) * gain
+    peak_limit = 10 ** (peak_dbfs / 20)
+    if peak > peak_limit:
+        gain *= peak_limit / peak
+    return (audio * gain).astype(np.float32)
+
+
+def max_seconds_for(config=None):
+    """Seconds of reference audio XTTS uses with a model config (max_ref_len / gpt_cond_len)"""
+    if MAX_SECONDS is not None:
+        return MAX_SECONDS
+    seconds = max(getattr(config, "max_ref_len", 0) or 0, getattr(config, "gpt_cond_len", 0) or 0)
+    return float(seconds) or DEFAULT_MAX_SECONDS
+
+
+def process(audio, sample_rate, max_seconds=DEFAULT_MAX_SECONDS):
+    """Full clean-up of decoded audio, returns samples at TARGET_SAMPLE_RATE"""
+    audio = resample(np.asarray(audio, dtype=np.float32), sample_rate)
+    audio = trim_silence(audio, TARGET_SAMPLE_RATE)
+    audio = audio[:int(max_seconds * TARGET_SAMPLE_RATE)]
+    return normalize_loudness(audio)
+
+
+def prepared_path(audio_hash, max_seconds, reference_dir=DEFAULT_REFERENCE_DIR):
+    return os.path.join(reference_dir, f"{audio_hash}.v{VERSION}.{max_seconds:g}s.wav")
+
+
+def prepare_reference(path, reference_dir=DEFAULT_REFERENCE_DIR, audio_hash=None, config=None):
+    """Path of the cleaned-up version of a reference clip for a model config, creating it on first use"""
+    if not ENABLED:
+        return path
+    if audio_hash is None:
+        from speaker_cache import get_speaker_cache
+        audio_hash = get_speaker_cache().audio_hash(path)
+    max_seconds = max_seconds_for(config)
+    target = prepared_path(audio_hash, max_seconds, reference_dir)
+    if os.path.exists(target):
+        return target
+
+    from scipy.io import wavfile
+    with span("prepare_reference"):
+        audio, sample_rate = decode(path)
+        audio = process(audio, sample_rate, max_seconds)
+    if not len(audio):
+        # Nothing usable left, let XTTS deal with the original
+        return path
+    with _lock:
+        os.makedirs(reference_dir, exist_ok=True)
+        tmp_path = target + ".tmp.wav"
+        wavfile.write(tmp_path, TARGET_SAMPLE_RATE, (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16))
+        os.replace(tmp_path, target)
+    return target
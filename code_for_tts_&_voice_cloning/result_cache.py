@@ -0,0 +1,157 @@
+"""Content-addressed cache of synthesized audio.
+
+The same prompts are requested over and over, so finished waveforms are
+stored on disk under a hash of everything that affects the output (model,
+backend and numeric precision, speaker or speaker-sample hash, language,
+text and pitch). A hit returns the
+stored audio without touching the model. The cache is bounded in size and
+evicts the least recently used entries.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from cache_paths import cache_dir
+from runtime_config import get_runtime_config, resolve_device
+from speaker_cache import get_speaker_cache
+
+DEFAULT_CACHE_DIR = cache_dir("results", "TTS_RESULT_CACHE_DIR")
+# Size limit for cached audio in megabytes (override with TTS_RESULT_CACHE_MB)
+DEFAULT_MAX_MB = int(os.environ.get("TTS_RESULT_CACHE_MB", "1024"))
+
+
+def precision(backend="pytorch", device=None):
+    """Numeric mode a model computes in: int8 (TTS_QUANTIZE on CPU), the autocast dtype, or float32"""
+    if backend != "pytorch":
+        # Exported artifacts (vits_export.py) always run in float32
+        return "float32"
+    from cpu_mode import QUANTIZE
+    device = resolve_device(device)
+    if device == "cpu" and QUANTIZE:
+        return "int8"
+    return get_runtime_config().dtype_for(device)
+
+
+def cache_key(model_name, text, speaker=None, speaker_wav=None, language=None, pitch_factor=1.0,
+              pitch_mode=None, backend="pytorch", device=None):
+    """Hash of every setting that changes the synthesized audio"""
+    sample_hash = get_speaker_cache().audio_hash(speaker_wav) if speaker_wav else None
+    settings = {
+        "model": model_name,
+        "backend": backend,
+        "precision": precision(backend, device),
+        "speaker": speaker,
+        "speaker_sample": sample_hash,
+        "language": language,
+        "text": text,
+        "pitch": round(float(pitch_factor), 2),
+    }
+    if pitch_mode is not None:
+        settings["pitch_mode"] = pitch_mode
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def write_wav(path, wav, sample_rate):
+    """Write a float waveform as 16-bit PCM, the same way TTS.save_wav does"""
+    from scipy.io import wavfile
+    wav = np.asarray(wav, dtype=np.float32)
+    peak = max(0.01, float(np.max(np.abs(wav)))) if wav.size else 1.0
+    wavfile.write(path, sample_rate, (wav * (32767 / peak)).astype(np.int16))
+
+
+class ResultCache:
+    """Disk-backed LRU cache of (waveform, sample rate) keyed by cache_key()"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._entries = None  # key -> (size, last used), loaded on first use
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (wav, sample_rate) for a cached result, or None"""
+        path = self._path(key)
+        with self._lock:
+            if key not in self._load_index():
+                self.misses += 1
+                return None
+        # Loading a long waveform must not hold up other lookups and puts
+        try:
+            with np.load(path) as data:
+                result = data["wav"], int(data["sample_rate"])
+        except (OSError, KeyError, ValueError):
+            # Evicted by another thread or process, or damaged; treat as a miss
+            with self._lock:
+                self._entries.pop(key, None)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self._touch(key, path)
+        return result
+
+    def put(self, key, wav, sample_rate):
+        path = self._path(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, wav=np.asarray(wav, dtype=np.float32), sample_rate=sample_rate)
+        os.replace(tmp_path, path)
+        with self._lock:
+            entries = self._load_index()
+            entries[key] = (os.path.getsize(path), os.path.getmtime(path))
+            self._evict()
+
+    def stats_text(self):
+        return f"cache: {self.hits} hits / {self.misses} misses"
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def _touch(self, key, path):
+        try:
+            os.utime(path)
+            self._entries[key] = (os.path.getsize(path), os.path.getmtime(path))
+        except OSError:
+            pass
+
+    def _load_index(self):
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isdir(self.cache_dir):
+                for entry in os.scandir(self.cache_dir):
+                    name = entry.name
+                    if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+                        stat = entry.stat()
+                        self._entries[name[:-4]] = (stat.st_size, stat.st_mtime)
+        return self._entries
+
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            del self._entries[key]
+            total -= size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
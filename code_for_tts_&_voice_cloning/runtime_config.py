@@ -0,0 +1,229 @@
+"""Runtime configuration: device, threads, precision and concurrency in one place.
+
+The scripts used to decide these each on their own (gpu=True in one,
+gpu=False in another, torch's default thread count everywhere). Now the
+machine is probed once: usable cores (CPU affinity and cgroup quota),
+available memory and the GPU. RuntimeConfig turns that into
+    device        cuda if a GPU is usable, otherwise cpu
+    max_jobs      how many requests or worker processes run side by side
+    threads       torch intra-op threads: all cores for a process that runs
+                  one job at a time, an equal share for concurrent workers
+    dtype         float32 unless reduced precision is asked for
+and the model pool applies it to every model it builds. torch's CPU thread
+count is process-wide, so only CPU models set it; a GPU model leaves it alone. Every synthesis call
+runs under config.inference_context(), which adds autocast when the dtype
+asks for it.
+
+Each choice can be overridden: TTS_DEVICE (auto, cpu, cuda), TTS_THREADS,
+TTS_INTEROP_THREADS, TTS_DTYPE and TTS_MAX_JOBS. Reduced precision is opt-in,
+because nothing checks what it does to the audio: TTS_DTYPE=float16 or
+bfloat16 autocasts on the GPU, auto picks float16 on GPUs with tensor cores
+and float32 elsewhere; the default is float32. Print what was picked on this machine with:
+    python runtime_config.py
+"""
+import contextlib
+import functools
+import logging
+import os
+import threading
+
+logger = logging.getLogger("tts.runtime")
+
+DTYPES = ("float32", "float16", "bfloat16")
+# Rough working memory of one running chunk (activations, decoder buffers)
+JOB_MEMORY_MB = 512
+MAX_CPU_JOBS = 4
+
+
+def usable_cores():
+    """CPU cores this process may use, honouring affinity masks and cgroup CPU quotas"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def available_memory_mb():
+    """Memory available for new allocations, or None where it cannot be read"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def probe_gpu():
+    """(name, memory MB, compute capability) of the first CUDA device, or None; probed once per process"""
+    try:
+        import torch
+    except (ImportError, OSError):
+        # Not installed, or a broken CUDA build that cannot load its libraries
+        return None
+    if not torch.cuda.is_available():
+        return None
+    properties = torch.cuda.get_device_properties(0)
+    return properties.name, properties.total_memory / (1024 * 1024), (properties.major, properties.minor)
+
+
+class RuntimeConfig:
+    """Device, thread, precision and concurrency settings derived from the machine"""
+
+    def __init__(self, device=None, threads=None, interop_threads=None, dtype=None, max_jobs=None):
+        device = device or os.environ.get("TTS_DEVICE", "auto")
+        dtype = dtype or os.environ.get("TTS_DTYPE", "float32")
+        if dtype != "auto" and dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}', expected auto or one of: {', '.join(DTYPES)}")
+
+        self.cores = usable_cores()
+        self.memory_mb = available_memory_mb()
+        # Probing the GPU imports torch, so it is skipped when the device is fixed to cpu
+        self.gpu = probe_gpu() if device != "cpu" else None
+        if device == "cuda" and self.gpu is None:
+            logger.warning("CUDA was requested but no GPU is usable, running on CPU")
+        self.device = "cuda" if self.gpu is not None and device in ("auto", "cuda") else "cpu"
+
+        self.max_jobs = max_jobs or int(os.environ.get("TTS_MAX_JOBS", "0")) or self._default_jobs(self.device)
+        self._threads = threads or int(os.environ.get("TTS_THREADS", "0")) or None
+        self.interop_threads = interop_threads or int(os.environ.get("TTS_INTEROP_THREADS", "0")) or None
+        self.dtype = dtype
+
+    def _default_jobs(self, device):
+        if device != "cpu":
+            # One model on one GPU is fastest with one stream of work
+            return 1
+        jobs = min(MAX_CPU_JOBS, self.cores // 2)
+        if self.memory_mb is not None:
+            jobs = min(jobs, int(self.memory_mb // JOB_MEMORY_MB))
+        return max(1, jobs)
+
+    def threads_for(self, device, jobs=1):
+        """torch intra-op threads for each of `jobs` CPU jobs running side by side; None on a GPU"""
+        if device != "cpu":
+            return self._threads
+        return self._threads or max(1, self.cores // jobs)
+
+    def max_jobs_for(self, device):
+        """Requests or worker processes to run side by side on a device"""
+        return self.max_jobs if device == self.device else self._default_jobs(device)
+
+    def dtype_for(self, device):
+        """Compute dtype for models on a device"""
+        if device == "cpu":
+            # float16 is slower than float32 on CPUs; bfloat16 only when asked for
+            return "bfloat16" if self.dtype == "bfloat16" else "float32"
+        if self.dtype != "auto":
+            return self.dtype
+        # Tensor cores (compute capability 7.0+) make float16 autocast pay off
+        return "float16" if self.gpu is not None and self.gpu[2] >= (7, 0) else "float32"
+
+    def apply(self, tts, device, cpu_mode=True):
+        """Configure torch threads (and the CPU mode) for a model freshly loaded on CPU"""
+        from cpu_mode import apply_cpu_mode, configure_threads
+        if device != "cpu":
+            # The thread count is process-wide and belongs to the CPU models
+            return tts
+        threads = self.threads_for(device)
+        if cpu_mode:
+            apply_cpu_mode(tts, threads=threads, interop_threads=self.interop_threads)
+        else:
+            configure_threads(threads, self.interop_threads)
+        return tts
+
+    @contextlib.contextmanager
+    def inference_context(self, device):
+        """inference_mode, plus autocast when the device's dtype is not float32"""
+        import torch
+        dtype = self.dtype_for(device)
+        with torch.inference_mode():
+            if dtype == "float32":
+                yield
+            else:
+                with torch.autocast(device_type="cuda" if device.startswith("cuda") else "cpu",
+                                    dtype=getattr(torch, dtype)):
+                    yield
+
+    def describe(self):
+        memory = f"{self.memory_mb / 1024:.1f} GB available" if self.memory_mb is not None else "memory unknown"
+        gpu = f"{self.gpu[0]} ({self.gpu[1] / 1024:.1f} GB)" if self.gpu else "none"
+        return (f"device {self.device}, {self.max_jobs} job(s), {self.threads_for('cpu')} CPU thread(s), "
+                f"dtype {self.dtype_for(self.device)} | {self.cores} cores, {memory}, GPU: {gpu}")
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_runtime_config():
+    """Process-wide runtime configuration, probed on first use"""
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = RuntimeConfig()
+            logger.info("Runtime: %s", _config.describe())
+        return _config
+
+
+def configure(**settings):
+    """Replace the process-wide configuration, e.g. from command-line flags"""
+    global _config
+    with _config_lock:
+        _config = RuntimeConfig(**settings)
+        logger.info("Runtime: %s", _config.describe())
+        return _config
+
+
+def resolve_device(device=None):
+    """Turn None/"auto" into the configured device and fall back to cpu when CUDA is missing"""
+    if device in (None, "auto"):
+        return get_runtime_config().device
+    if device.startswith("cuda") and probe_gpu() is None:
+        logger.warning("CUDA was requested but no GPU is usable, running on CPU")
+        return "cpu"
+    return device
+
+
+_model_locks_lock = threading.Lock()
+
+
+def model_lock(model):
+    """Lock that serializes inference on one model instance (a TTS object or its tts_model).
+
+    Neither Coqui's Synthesizer nor XTTS inference is thread-safe (both keep
+    state on the model and the tokenizer), so every call into a model holds
+    its lock. Reentrant, because cloning computes the speaker latents from
+    inside a locked call.
+    """
+    # A TTS object and its PyTorch model share one lock; exported voices lock the TTS object
+    model = getattr(getattr(model, "synthesizer", None), "tts_model", None) or model
+    lock = getattr(model, "inference_lock", None)
+    if lock is None:
+        with _model_locks_lock:
+            lock = getattr(model, "inference_lock", None)
+            if lock is None:
+                lock = model.inference_lock = threading.RLock()
+    return lock
+
+
+def model_device(tts):
+    """Device type the PyTorch model of a TTS instance lives on"""
+    try:
+        return next(tts.synthesizer.tts_model.parameters()).device.type
+    except (AttributeError, StopIteration):
+        return "cpu"
+
+
+if __name__ == "__main__":
+    print(get_runtime_config().describe())
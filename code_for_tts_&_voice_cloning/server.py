@@ -0,0 +1,356 @@
+"""Local HTTP synthesis server.
+
+Endpoints (POST, JSON body):
+    /tts    {"text": ..., "voice": "female" | "male", "speaker": "p226"}
+    /clone  {"text": ..., "speaker_audio": base64 encoded clip, "language": "en"}
+            (or "library_voice": a voice library name, or "speaker_wav": a
+            file name inside --reference-dir instead of speaker_audio)
+
+Add "stream": true to receive the WAV chunk by chunk as sentences are
+rendered, or "format": "pcm" for raw 16-bit mono samples.
+
+Uploaded clips may be WAV, FLAC, OGG/Opus or MP3; the server only reads
+reference clips it was sent, voice library clips and files inside the
+reference directory (--reference-dir or TTS_SERVER_REFERENCE_DIR).
+
+Models stay resident in the shared model pool. Requests for the same model
+that arrive within a short window are coalesced into a micro-batch and their
+sentences are rendered round-robin, so every request in the batch gets its
+first audio quickly.
+
+Example:
+    python server.py --port 8020
+    curl -X POST localhost:8020/tts -d '{"text": "Please hold."}' -o hold.wav
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from cache_paths import cache_dir
+from model_pool import get_pool
+from streaming import stream_speech
+from voices import TTS_MODELS
+
+UPLOAD_DIR = cache_dir("uploads")
+# Clips that requests may name in speaker_wav; None accepts uploads and library voices only
+REFERENCE_DIR = os.environ.get("TTS_SERVER_REFERENCE_DIR")
+
+# Marks the end of a request's audio in its chunk queue
+_END = object()
+
+
+def wav_header(sample_rate, data_bytes=0xFFFFFFFF - 36):
+    """16-bit mono WAV header; the default size marks a stream of unknown length"""
+    return struct.pack("<4sI4s4sIHHIIHH4sI",
+                       b"RIFF", min(data_bytes + 36, 0xFFFFFFFF), b"WAVE",
+                       b"fmt ", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16,
+                       b"data", data_bytes)
+
+
+def to_pcm16(wav):
+    return (np.clip(wav, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+class SynthesisRequest:
+    def __init__(self, text, speaker=None, speaker_wav=None, language=None):
+        self.text = text
+        self.speaker = speaker
+        self.speaker_wav = speaker_wav
+        self.language = language
+        # The worker puts the sample rate first, then waveform chunks, then _END
+        self.chunks = queue.Queue()
+        self.cancelled = False
+
+
+class MicroBatcher:
+    """Collects requests for one model and renders them in small batches"""
+
+    def __init__(self, model_name, device="cpu", max_batch=8, max_wait=0.05):
+        self.model_name = model_name
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, request):
+        self.requests.put(request)
+        return request
+
+    def _collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                tts = get_pool().get(self.model_name, self.device)
+            except Exception as e:
+                for request in batch:
+                    request.chunks.put(e)
+                continue
+
+            sample_rate = tts.synthesizer.output_sample_rate
+            streams = []
+            for request in batch:
+                request.chunks.put(sample_rate)
+                streams.append((request, stream_speech(tts, request.text,
+                                                       speaker=request.speaker,
+                                                       speaker_wav=request.speaker_wav,
+                                                       language=request.language)))
+
+            # Round-robin one sentence at a time across the batch
+            while streams:
+                still_running = []
+                for request, chunks in streams:
+                    if request.cancelled:
+                        continue
+                    try:
+                        request.chunks.put(next(chunks))
+                        still_running.append((request, chunks))
+                    except StopIteration:
+                        request.chunks.put(_END)
+                    except Exception as e:
+                        request.chunks.put(e)
+                streams = still_running
+
+
+class SynthesisService:
+    """Routes requests to one micro-batcher per model"""
+
+    def __init__(self, device="cpu", max_batch=8, max_wait=0.05):
+        self.device = device
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._batchers = {}
+        self._lock = threading.Lock()
+
+    def batcher(self, model_name):
+        with self._lock:
+            if model_name not in self._batchers:
+                self._batchers[model_name] = MicroBatcher(model_name, self.device,
+                                                          self.max_batch, self.max_wait)
+            return self._batchers[model_name]
+
+    def submit_tts(self, text, voice="female", speaker=None):
+        if voice not in TTS_MODELS["standard"]:
+            raise ValueError(f"Unknown voice '{voice}'")
+        if voice == "male":
+            speaker = speaker or "p226"
+        request = SynthesisRequest(text, speaker=speaker)
+        return self.batcher(TTS_MODELS["standard"][voice]).submit(request)
+
+    def submit_clone(self, text, speaker_wav, language="en"):
+        request = SynthesisRequest(text, speaker_wav=speaker_wav, language=language)
+        return self.batcher(TTS_MODELS["xtts"]).submit(request)
+
+
+def sniff_audio_format(data):
+    """File extension for the container in data's header bytes, or None"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return ".wav"
+    if data[:4] == b"fLaC":
+        return ".flac"
+    if data[:4] == b"OggS":
+        return ".ogg"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return ".mp3"
+    return None
+
+
+def save_upload(encoded_audio):
+    """Store a base64 reference clip under its content hash and return the path"""
+    data = base64.b64decode(encoded_audio)
+    ext = sniff_audio_format(data)
+    if ext is None:
+        raise ValueError("'speaker_audio' must be a WAV, FLAC, OGG/Opus or MP3 file")
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    # The extension matters: decoders that cannot sniff the content go by it
+    path = os.path.join(UPLOAD_DIR, hashlib.sha256(data).hexdigest() + ext)
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(data)
+    return path
+
+
+def reference_path(name, reference_dir=REFERENCE_DIR):
+    """Path of a clip named by a request, which must lie inside reference_dir"""
+    if not reference_dir:
+        raise ValueError("'speaker_wav' is not accepted by this server, send 'speaker_audio' instead")
+    root = os.path.realpath(reference_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError("'speaker_wav' must name a file in the reference directory")
+    return path
+
+
+def clone_reference(params, reference_dir=REFERENCE_DIR):
+    """The reference clip a /clone request asks for, as a server path"""
+    if params.get("speaker_audio"):
+        return save_upload(params["speaker_audio"])
+    if params.get("library_voice"):
+        from voice_library import get_voice_library
+        try:
+            return get_voice_library().load(params["library_voice"])
+        except KeyError:
+            raise ValueError(f"No voice named '{params['library_voice']}' in the voice library")
+    if params.get("speaker_wav"):
+        return reference_path(params["speaker_wav"], reference_dir)
+    raise ValueError("/clone needs 'speaker_audio', 'library_voice' or 'speaker_wav'")
+
+
+class SynthesisHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+    reference_dir = REFERENCE_DIR
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("The request body must be a JSON object")
+            text = (params.get("text") or "").strip()
+            if not text:
+                raise ValueError("'text' is required")
+
+            if self.path == "/tts":
+                request = self.service.submit_tts(text, params.get("voice", "female"), params.get("speaker"))
+            elif self.path == "/clone":
+                speaker_wav = clone_reference(params, self.reference_dir)
+                request = self.service.submit_clone(text, speaker_wav, params.get("language", "en"))
+            else:
+                self._send_error(404, "Unknown endpoint")
+                return
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_error(400, str(e))
+            return
+
+        raw_pcm = params.get("format") == "pcm"
+        try:
+            if params.get("stream"):
+                self._stream_response(request, raw_pcm)
+            else:
+                self._full_response(request, raw_pcm)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away, stop rendering the rest of its sentences
+            request.cancelled = True
+
+    def _next_item(self, request):
+        item = request.chunks.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def _full_response(self, request, raw_pcm):
+        try:
+            sample_rate = self._next_item(request)
+            pcm = []
+            while True:
+                item = self._next_item(request)
+                if item is _END:
+                    break
+                pcm.append(to_pcm16(item))
+        except Exception as e:
+            self._send_error(500, f"Error generating speech: {e}")
+            return
+
+        body = b"".join(pcm)
+        if not raw_pcm:
+            body = wav_header(sample_rate, len(body)) + body
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/L16" if raw_pcm else "audio/wav")
+        self.send_header("X-Sample-Rate", str(sample_rate))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_response(self, request, raw_pcm):
+        try:
+            sample_rate = self._next_item(request)
+        except Exception as e:
+            self._send_error(500, f"Error generating speech: {e}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/L16" if raw_pcm else "audio/wav")
+        self.send_header("X-Sample-Rate", str(sample_rate))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if not raw_pcm:
+            self._write_chunk(wav_header(sample_rate))
+        try:
+            while True:
+                item = self._next_item(request)
+                if item is _END:
+                    break
+                self._write_chunk(to_pcm16(item))
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            # Headers are already sent, all we can do is cut the stream short
+            self.log_error("Error generating speech: %s", e)
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host="127.0.0.1", port=8020, device="cpu", max_batch=8, max_wait=0.05, reference_dir=REFERENCE_DIR):
+    SynthesisHandler.service = SynthesisService(device, max_batch, max_wait)
+    SynthesisHandler.reference_dir = reference_dir
+    server = ThreadingHTTPServer((host, port), SynthesisHandler)
+    print(f"Serving speech synthesis on http://{host}:{port} (POST /tts, /clone)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP text-to-speech server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8020)
+    parser.add_argument("--device", default="auto", help="auto (see runtime_config.py), cpu or cuda")
+    parser.add_argument("--max-batch", type=int, default=8,
+                        help="most requests coalesced into one batch")
+    parser.add_argument("--max-wait-ms", type=float, default=50,
+                        help="how long to wait for more requests before starting a batch")
+    parser.add_argument("--reference-dir", default=REFERENCE_DIR,
+                        help="folder of reference clips that /clone requests may name in speaker_wav")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.device, args.max_batch, args.max_wait_ms / 1000, args.reference_dir)
+
+
+if __name__ == "__main__":
+    main()
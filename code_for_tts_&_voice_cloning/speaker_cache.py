@@ -0,0 +1,172 @@
+"""XTTS speaker-profile cache.
+
+XTTS computes GPT conditioning latents and a speaker embedding from the
+reference WAV on every request. Those only depend on the reference audio, so
+they are computed once per audio content hash, kept in memory and stored on
+disk as a small .npz file per voice. On a miss the clip first goes through
+reference_audio.prepare_reference(), so XTTS gets a clean mono 22.05 kHz clip.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+import reference_audio
+from cache_paths import cache_dir, safe_filename
+from profiling import span
+from runtime_config import get_runtime_config, model_device, model_lock
+
+DEFAULT_CACHE_DIR = cache_dir("speakers", "TTS_SPEAKER_CACHE_DIR")
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _latents_tag(model_tag):
+    """Latents of prepared clips differ from those of raw clips, so they are cached apart"""
+    if not reference_audio.ENABLED:
+        return model_tag
+    if reference_audio.MAX_SECONDS is not None:
+        # Clips cut to another length than the model config's give other latents
+        return f"{model_tag}-ref{reference_audio.VERSION}-{reference_audio.MAX_SECONDS:g}s"
+    return f"{model_tag}-ref{reference_audio.VERSION}"
+
+
+class SpeakerCache:
+    """Conditioning latents for reference clips, keyed by audio content hash"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._latents = {}  # (model tag, audio hash) -> (gpt_cond_latent, speaker_embedding)
+        self._file_hashes = {}  # (path, size, mtime) -> audio hash
+        self._lock = threading.Lock()
+
+    def audio_hash(self, path):
+        """Content hash of a reference clip, memoized on (path, size, mtime)"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if key in self._file_hashes:
+                return self._file_hashes[key]
+        digest = hash_file(path)
+        with self._lock:
+            self._file_hashes[key] = digest
+        return digest
+
+    def get_latents(self, model, speaker_wav, model_tag="xtts_v2"):
+        """Return (gpt_cond_latent, speaker_embedding) for a reference clip"""
+        audio_hash = self.audio_hash(speaker_wav)
+        model_tag = _latents_tag(model_tag)
+        key = (model_tag, audio_hash)
+        with self._lock:
+            if key in self._latents:
+                return self._to_device(self._latents[key], model)
+
+        import torch
+        cache_file = self._cache_file(model_tag, audio_hash)
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as data:
+                latents = (torch.from_numpy(data["gpt_cond_latent"]),
+                           torch.from_numpy(data["speaker_embedding"]))
+        else:
+            # The hash is of the original clip, so the prepared copy is found without decoding it
+            prepared_wav = reference_audio.prepare_reference(speaker_wav, audio_hash=audio_hash,
+                                                             config=getattr(model, "config", None))
+            with model_lock(model), span("speaker_latents"):
+                latents = self._compute_latents(model, prepared_wav)
+            self._save(cache_file, latents)
+
+        with self._lock:
+            self._latents[key] = latents
+        return self._to_device(latents, model)
+
+    def remember(self, speaker_wav, audio_hash, latents, model_tag="xtts_v2"):
+        """Register latents computed elsewhere (e.g. the voice library) for a clip"""
+        stat = os.stat(speaker_wav)
+        with self._lock:
+            self._file_hashes[(os.path.abspath(speaker_wav), stat.st_size, stat.st_mtime_ns)] = audio_hash
+            self._latents[(_latents_tag(model_tag), audio_hash)] = latents
+
+    def _compute_latents(self, model, speaker_wav):
+        config = model.config
+        gpt_cond_latent, speaker_embedding = model.get_conditioning_latents(
+            audio_path=[speaker_wav],
+            gpt_cond_len=config.gpt_cond_len,
+            gpt_cond_chunk_len=config.gpt_cond_chunk_len,
+            max_ref_length=config.max_ref_len,
+            sound_norm_refs=config.sound_norm_refs,
+        )
+        return gpt_cond_latent.detach().cpu(), speaker_embedding.detach().cpu()
+
+    def _cache_file(self, model_tag, audio_hash):
+        return os.path.join(self.cache_dir, safe_filename(model_tag), f"{audio_hash}.npz")
+
+    @staticmethod
+    def _save(cache_file, latents):
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a half-written profile
+        tmp_file = cache_file + ".tmp.npz"
+        np.savez(tmp_file,
+                 gpt_cond_latent=latents[0].numpy(),
+                 speaker_embedding=latents[1].numpy())
+        os.replace(tmp_file, cache_file)
+
+    @staticmethod
+    def _to_device(latents, model):
+        device = next(model.parameters()).device
+        return tuple(latent.to(device) for latent in latents)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_speaker_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SpeakerCache()
+        return _default_cache
+
+
+def clone_speech(tts, text, speaker_wav, language, cache=None):
+    """Synthesize with XTTS using cached conditioning latents, returns a float waveform"""
+    import torch
+    cache = cache or get_speaker_cache()
+    model = tts.synthesizer.tts_model
+    config = model.config
+    # XTTS inference is not thread-safe, so one call at a time uses the model
+    with model_lock(tts):
+        gpt_cond_latent, speaker_embedding = cache.get_latents(model, speaker_wav)
+        # Autocast too if the runtime config picked a lower precision for the device
+        with get_runtime_config().inference_context(model_device(tts)):
+            out = model.inference(
+                text,
+                language,
+                gpt_cond_latent,
+                speaker_embedding,
+                temperature=config.temperature,
+                length_penalty=config.length_penalty,
+                repetition_penalty=config.repetition_penalty,
+                top_k=config.top_k,
+                top_p=config.top_p,
+                enable_text_splitting=True,
+            )
+    wav = out["wav"]
+    if torch.is_tensor(wav):
+        wav = wav.cpu().numpy()
+    return np.asarray(wav, dtype=np.float32).squeeze()
+
+
+def clone_speech_to_file(tts, text, file_path, speaker_wav, language, cache=None):
+    """Same as clone_speech, but writes the result like tts_to_file"""
+    wav = clone_speech(tts, text, speaker_wav, language, cache=cache)
+    tts.synthesizer.save_wav(wav=wav, path=file_path)
+    return file_path
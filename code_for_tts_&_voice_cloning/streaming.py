@@ -0,0 +1,66 @@
+"""Sentence-level streaming synthesis.
+
+Instead of waiting for the whole text to be rendered, the text is split into
+sentences and each one is synthesized and yielded as soon as it is ready, so
+playback can start on the first sentence.
+"""
+import re
+
+import numpy as np
+
+from profiling import span
+from runtime_config import get_runtime_config, model_device, model_lock
+from speaker_cache import clone_speech
+
+# Split after sentence-ending punctuation (including CJK) or on blank lines
+SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s+|\n\s*\n")
+# Same trailing pause Coqui's synthesizer adds after every sentence
+SENTENCE_PAUSE_SAMPLES = 10000
+
+
+def split_sentences(text, min_chars=20):
+    """Split text into sentences, gluing very short fragments onto their neighbours"""
+    parts = [part.strip() for part in SENTENCE_END.split(text) if part and part.strip()]
+
+    sentences = []
+    pending = ""
+    for part in parts:
+        pending = f"{pending} {part}" if pending else part
+        # Very short fragments ("Hi.", "No!") sound clipped when rendered alone
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def output_sample_rate(tts):
+    return tts.synthesizer.output_sample_rate
+
+
+def synthesize_sentence(tts, sentence, speaker=None, speaker_wav=None, language=None):
+    """Render a single sentence to a float32 waveform; calls on the same model run one at a time"""
+    with model_lock(tts), span("synthesize_sentence", chars=len(sentence)):
+        if speaker_wav is not None:
+            wav = clone_speech(tts, sentence, speaker_wav, language)
+        elif tts.synthesizer.tts_model is None:
+            # Exported ONNX/TorchScript voices (vits_export.py) have no PyTorch model to guard
+            wav = tts.tts(text=sentence, speaker=speaker, split_sentences=False)
+        else:
+            # inference_mode (which also skips the version counting no_grad still does),
+            # plus autocast if the runtime config picked a lower precision for the device
+            with get_runtime_config().inference_context(model_device(tts)):
+                wav = tts.tts(text=sentence, speaker=speaker, split_sentences=False)
+    return np.asarray(wav, dtype=np.float32)
+
+
+def stream_speech(tts, text, speaker=None, speaker_wav=None, language=None):
+    """Yield one float32 waveform per sentence as soon as it is synthesized"""
+    # Sentences over the model's per-language budget are cut into clauses
+    from chunking import split_text
+    for sentence in split_text(text, language or "en"):
+        yield synthesize_sentence(tts, sentence, speaker=speaker, speaker_wav=speaker_wav, language=language)
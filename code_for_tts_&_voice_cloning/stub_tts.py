@@ -0,0 +1,107 @@
+"""Small stand-in for Coqui TTS models, for benchmarks that must run offline.
+
+StubTTS exposes the parts of TTS.api.TTS that this project uses (tts(),
+synthesizer.output_sample_rate, synthesizer.tts_model, save_wav, to()) and
+does a comparable kind of CPU work: a convolutional text encoder followed by
+a transposed-convolution waveform decoder. The XTTS stand-in also implements
+get_conditioning_latents() and inference() so the cloning path runs end to end.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from torch import nn
+
+from result_cache import write_wav
+from streaming import SENTENCE_PAUSE_SAMPLES
+
+
+class StubVoiceModel(nn.Module):
+    """Text bytes -> waveform, shaped loosely like VITS"""
+
+    def __init__(self, channels=192, layers=6, hop_length=256, frames_per_char=6):
+        super().__init__()
+        self.frames_per_char = frames_per_char
+        self.embedding = nn.Embedding(256, channels)
+        self.encoder = nn.Sequential(*[
+            module for _ in range(layers)
+            for module in (nn.Conv1d(channels, channels, 5, padding=2), nn.ReLU())
+        ])
+        self.waveform_decoder = nn.Sequential(
+            nn.ConvTranspose1d(channels, 64, kernel_size=16, stride=16),
+            nn.ReLU(),
+            nn.ConvTranspose1d(64, 1, kernel_size=hop_length // 16, stride=hop_length // 16),
+        )
+
+    def forward(self, text, speaker_embedding=None):
+        ids = torch.tensor(list(text.encode("utf-8")) or [32], dtype=torch.long,
+                           device=self.embedding.weight.device)
+        x = self.embedding(ids).T.unsqueeze(0)
+        if speaker_embedding is not None:
+            x = x + speaker_embedding.reshape(1, -1, 1)[:, :x.shape[1]]
+        x = x.repeat_interleave(self.frames_per_char, dim=2)
+        x = self.encoder(x)
+        return torch.tanh(self.waveform_decoder(x)).squeeze() * 0.5
+
+
+class StubXtts(StubVoiceModel):
+    """Adds the conditioning and inference methods used by speaker_cache"""
+
+    def __init__(self, channels=192, **kwargs):
+        super().__init__(channels=channels, **kwargs)
+        self.config = SimpleNamespace(
+            gpt_cond_len=6, gpt_cond_chunk_len=6, max_ref_len=30, sound_norm_refs=False,
+            temperature=0.75, length_penalty=1.0, repetition_penalty=10.0, top_k=50, top_p=0.85,
+        )
+        self.reference_encoder = nn.Sequential(
+            nn.Conv1d(1, channels, 400, stride=160), nn.ReLU(),
+            nn.Conv1d(channels, channels, 3, padding=1), nn.ReLU(),
+        )
+
+    def get_conditioning_latents(self, audio_path, **kwargs):
+        from scipy.io import wavfile
+        _, audio = wavfile.read(audio_path[0])
+        audio = torch.from_numpy(audio.astype(np.float32) / 32768.0).reshape(1, 1, -1)
+        features = self.reference_encoder(audio.to(self.embedding.weight.device))
+        speaker_embedding = features.mean(dim=2, keepdim=True)
+        gpt_cond_latent = features[:, :, :32].transpose(1, 2)
+        return gpt_cond_latent, speaker_embedding
+
+    def inference(self, text, language, gpt_cond_latent, speaker_embedding, **kwargs):
+        return {"wav": self.forward(text, speaker_embedding=speaker_embedding)}
+
+
+class StubSynthesizer:
+    def __init__(self, model, sample_rate):
+        self.tts_model = model
+        self.vocoder_model = None
+        self.output_sample_rate = sample_rate
+
+    def save_wav(self, wav, path):
+        write_wav(path, wav, self.output_sample_rate)
+
+
+class StubTTS:
+    """Drop-in for TTS.api.TTS in benchmarks"""
+
+    def __init__(self, model_name="stub", sample_rate=22050):
+        model = StubXtts() if "xtts" in model_name else StubVoiceModel()
+        model.eval()
+        self.model_name = model_name
+        self.synthesizer = StubSynthesizer(model, sample_rate)
+
+    def to(self, device):
+        self.synthesizer.tts_model.to(device)
+        return self
+
+    def tts(self, text, speaker=None, language=None, speaker_wav=None, split_sentences=True, **kwargs):
+        with torch.inference_mode():
+            wav = self.synthesizer.tts_model(text).cpu().numpy()
+        wav = np.concatenate([wav, np.zeros(SENTENCE_PAUSE_SAMPLES, dtype=wav.dtype)])
+        # Coqui returns a plain list of floats
+        return wav.tolist()
+
+
+def load_stub(model_name, device="cpu"):
+    """ModelPool loader that builds stub models instead of downloading checkpoints"""
+    return StubTTS(model_name).to(device)
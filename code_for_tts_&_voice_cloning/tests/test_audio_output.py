@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+from audio_output import StreamResampler, normalize_peak, write_audio
+from result_cache import write_wav
+
+
+@pytest.mark.parametrize("input_rate, output_rate", [(22050, 24000), (22050, 48000), (48000, 22050), (24000, 16000)])
+def test_stream_resampler_matches_one_pass(input_rate, output_rate):
+    rng = np.random.default_rng(0)
+    signal = (rng.standard_normal(30000) * 0.1).astype(np.float32)
+    resampler = StreamResampler(input_rate, output_rate)
+    blocks = []
+    position = 0
+    while position < len(signal):
+        size = int(rng.integers(1, 3000))
+        blocks.append(resampler.write(signal[position:position + size]))
+        position += size
+    blocks.append(resampler.flush())
+    streamed = np.concatenate(blocks)
+
+    expected = resample_poly(signal, resampler.up, resampler.down)
+    assert len(streamed) == len(expected)
+    np.testing.assert_allclose(streamed, expected, atol=1e-5)
+
+
+def test_stream_resampler_with_tiny_input():
+    resampler = StreamResampler(22050, 24000)
+    out = np.concatenate([resampler.write(np.ones(3, dtype=np.float32)), resampler.flush()])
+    assert len(out) == len(resample_poly(np.ones(3), resampler.up, resampler.down))
+
+
+def test_normalize_peak_reaches_full_scale():
+    wav = normalize_peak(np.array([0.0, 0.25, -0.5], dtype=np.float32))
+    assert np.max(np.abs(wav)) == pytest.approx(32767 / 32768)
+
+
+def test_write_audio_wav_levels_match_write_wav(tmp_path):
+    wav = (np.sin(np.arange(4000) / 10) * 0.3).astype(np.float32)
+    write_audio(str(tmp_path / "a.wav"), wav, 22050)
+    write_wav(str(tmp_path / "b.wav"), wav, 22050)
+    rate, written = wavfile.read(tmp_path / "a.wav")
+    _, reference = wavfile.read(tmp_path / "b.wav")
+    assert rate == 22050
+    assert np.max(np.abs(written.astype(int) - reference.astype(int))) <= 1
+
+
+def test_write_audio_resamples_to_the_target_rate(tmp_path):
+    wav = np.zeros(22050, dtype=np.float32)
+    write_audio(str(tmp_path / "a.wav"), wav, 22050, target_rate=24000)
+    rate, written = wavfile.read(tmp_path / "a.wav")
+    assert rate == 24000
+    assert len(written) == 24000
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from chunking import CHAR_LIMITS, crossfade_concat, crossfade_stitch, split_text
+
+LONG_SENTENCE = ("When the committee finally met, after weeks of delay and a string of cancelled sessions, "
+                 "the chair opened with a summary of the budget, the staffing plan and the schedule; "
+                 "then, without pausing for questions, she moved on to the items that had been deferred "
+                 "from the previous quarter, which took the rest of the afternoon.")
+
+
+def test_short_sentences_stay_whole():
+    text = "The first sentence is here. And the second one follows."
+    assert split_text(text) == ["The first sentence is here.", "And the second one follows."]
+
+
+def test_long_sentence_is_cut_at_clauses_within_the_limit():
+    chunks = split_text(LONG_SENTENCE, "en")
+    assert len(chunks) > 1
+    assert all(len(chunk) <= CHAR_LIMITS["en"] for chunk in chunks)
+    # Every cut but the last falls on a clause boundary, and no word is lost
+    assert all(chunk[-1] in ",;:" for chunk in chunks[:-1])
+    assert " ".join(chunks).split() == LONG_SENTENCE.split()
+
+
+def test_run_without_spaces_is_cut_at_the_zh_cn_limit():
+    text = "这是一个很长的句子" * 30
+    chunks = split_text(text, "zh-cn")
+    assert all(len(chunk) <= CHAR_LIMITS["zh-cn"] for chunk in chunks)
+    assert "".join(chunks) == text
+
+
+def test_max_chars_overrides_the_language_limit():
+    chunks = split_text(LONG_SENTENCE, "en", max_chars=60)
+    assert all(len(chunk) <= 60 for chunk in chunks)
+
+
+@pytest.mark.parametrize("lengths", [[500, 300, 400], [500, 5, 400], [3], []])
+def test_crossfade_length(lengths):
+    sample_rate = 1000  # 10 ms crossfade = 10 samples
+    waves = [np.ones(n, dtype=np.float32) for n in lengths]
+    wav = crossfade_concat(waves, sample_rate)
+    overlaps = sum(min(10, a, b) for a, b in zip(lengths, lengths[1:]))
+    assert len(wav) == sum(lengths) - overlaps
+
+
+def test_crossfade_of_equal_levels_is_flat():
+    waves = [np.full(200, 0.5, dtype=np.float32) for _ in range(4)]
+    wav = crossfade_concat(waves, 1000)
+    np.testing.assert_allclose(wav, 0.5, atol=1e-6)
+
+
+def test_stitched_blocks_match_the_concatenation():
+    rng = np.random.default_rng(0)
+    waves = [rng.standard_normal(n).astype(np.float32) for n in (120, 7, 300, 64)]
+    blocks = list(crossfade_stitch(iter(waves), 1000))
+    np.testing.assert_array_equal(np.concatenate(blocks), crossfade_concat(waves, 1000))
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from pitch_shift import pitch_shift_fast, time_stretch_wsola
+
+SR = 22050
+
+
+def tone(frequency, seconds=1.0):
+    return np.sin(2 * np.pi * frequency * np.arange(int(SR * seconds)) / SR).astype(np.float32)
+
+
+def dominant_frequency(y):
+    spectrum = np.abs(np.fft.rfft(y * np.hanning(len(y))))
+    return np.fft.rfftfreq(len(y), 1 / SR)[np.argmax(spectrum)]
+
+
+@pytest.mark.parametrize("rate", [0.8, 1.0, 1.25])
+def test_wsola_changes_duration_by_one_over_rate(rate):
+    y = tone(440)
+    assert len(time_stretch_wsola(y, rate, SR)) == int(round(len(y) / rate))
+
+
+@pytest.mark.parametrize("rate", [0.8, 1.25])
+def test_wsola_keeps_the_pitch(rate):
+    stretched = time_stretch_wsola(tone(440), rate, SR)
+    assert dominant_frequency(stretched) == pytest.approx(440, abs=5)
+
+
+def test_wsola_handles_input_shorter_than_two_frames():
+    y = tone(440, seconds=0.01)
+    assert len(time_stretch_wsola(y, 1.25, SR)) == int(round(len(y) / 1.25))
+
+
+def test_fast_pitch_shift_keeps_length_and_moves_the_pitch():
+    shifted = pitch_shift_fast(tone(440), SR, 1.2)
+    assert len(shifted) == SR
+    assert dominant_frequency(shifted) == pytest.approx(528, abs=8)
@@ -0,0 +1,56 @@
+import numpy as np
+
+import cpu_mode
+from result_cache import ResultCache, cache_key
+
+MODEL = "tts_models/en/ljspeech/vits"
+
+
+def test_key_is_stable():
+    assert cache_key(MODEL, "Hello.", device="cpu") == cache_key(MODEL, "Hello.", device="cpu")
+
+
+def test_key_changes_with_the_audio_settings():
+    base = cache_key(MODEL, "Hello.", device="cpu")
+    assert cache_key(MODEL, "Hello!", device="cpu") != base
+    assert cache_key("tts_models/en/vctk/vits", "Hello.", speaker="p232", device="cpu") != base
+    assert cache_key(MODEL, "Hello.", backend="onnx", device="cpu") != base
+    assert cache_key(MODEL, "Hello.", pitch_factor=1.2, device="cpu") != base
+    assert cache_key(MODEL, "Hello.", pitch_factor=1.2, pitch_mode="fast", device="cpu") != \
+        cache_key(MODEL, "Hello.", pitch_factor=1.2, pitch_mode="quality", device="cpu")
+
+
+def test_pitch_is_rounded_like_the_slider():
+    assert cache_key(MODEL, "Hello.", pitch_factor=1.2, device="cpu") == \
+        cache_key(MODEL, "Hello.", pitch_factor=1.2004, device="cpu")
+
+
+def test_int8_mode_gets_its_own_key(monkeypatch):
+    base = cache_key(MODEL, "Hello.", device="cpu")
+    exported = cache_key(MODEL, "Hello.", backend="onnx", device="cpu")
+    monkeypatch.setattr(cpu_mode, "QUANTIZE", True)
+    assert cache_key(MODEL, "Hello.", device="cpu") != base
+    # Exported models always run in float32, whatever TTS_QUANTIZE says
+    assert cache_key(MODEL, "Hello.", backend="onnx", device="cpu") == exported
+
+
+def test_key_follows_the_reference_audio_not_its_path(tmp_path):
+    first, copy, other = tmp_path / "a.wav", tmp_path / "b.wav", tmp_path / "c.wav"
+    first.write_bytes(b"RIFF one")
+    copy.write_bytes(b"RIFF one")
+    other.write_bytes(b"RIFF two")
+    xtts = "tts_models/multilingual/multi-dataset/xtts_v2"
+    key = cache_key(xtts, "Hello.", speaker_wav=str(first), language="en", device="cpu")
+    assert cache_key(xtts, "Hello.", speaker_wav=str(copy), language="en", device="cpu") == key
+    assert cache_key(xtts, "Hello.", speaker_wav=str(other), language="en", device="cpu") != key
+
+
+def test_cache_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    wav = np.linspace(-1, 1, 100, dtype=np.float32)
+    cache.put("key", wav, 22050)
+    cached, rate = cache.get("key")
+    np.testing.assert_array_equal(cached, wav)
+    assert rate == 22050
+    assert cache.get("missing") is None
+    assert (cache.hits, cache.misses) == (1, 1)
@@ -1,11 +1,24 @@
-from TTS.api import TTS
+import argparse
+import time
 
+from audio_output import FORMATS, write_audio
+from chunking import render_long_text
+from frontend_cache import get_frontend_cache
+from model_pool import get_pool
+from pipeline_metrics import StageTimer
+from profiling import PROFILE_MODES, profiler_for
+from result_cache import cache_key, get_result_cache
+from runtime_config import get_runtime_config
+from voices import BACKENDS
 
-def text_to_speech():
+
+def text_to_speech(backend="pytorch", audio_format="wav", sample_rate=None, bit_depth=16, profile=None, device=None,
+                   workers=1):
+    profiler = None
     try:
         # Prompt the user for input
         text = input("Enter the text you want to convert to speech: ")
-        file_name = input("Enter the output file name (without extension): ") + ".wav"
+        file_name = input("Enter the output file name (without extension): ") + "." + audio_format
 
         # Prompt the user to choose a voice
         print("\nChoose a voice:")
@@ -14,33 +27,56 @@ def text_to_speech():
         choice = input("Enter your choice (male or female): ").strip().lower()
 
         if choice == "male":
+            model_name = "tts_models/en/vctk/vits"
+            speaker = "p232"
             print("\nInitializing FastPitch model (VCTK dataset)...")
-            tts = TTS(model_name="tts_models/en/vctk/vits", progress_bar=False, gpu=False)
-
-            print("Generating speech with male voice (p232)...")
-            tts.tts_to_file(
-                text=text,
-                file_path=file_name,
-                speaker="p232" 
-            )
-
         elif choice == "female":
+            model_name = "tts_models/en/ljspeech/vits"
+            speaker = None
             print("\nInitializing FastPitch model (LJ Speech dataset)...")
-            tts = TTS(model_name="tts_models/en/ljspeech/vits", progress_bar=False, gpu=False)
+        else:
+            print("\nInvalid choice. Using default female voice (LJ Speech/FastPitch).")
+            model_name = "tts_models/en/ljspeech/fast_pitch"
+            speaker = None
 
-            print("Generating speech with female voice...")
-            tts.tts_to_file(
-                text=text,
-                file_path=file_name
-            )
+        # Profiling (--profile or TTS_PROFILE) starts after the prompts, so typing is not measured
+        profiler = profiler_for(f"tts-{time.strftime('%Y%m%d-%H%M%S')}", mode=profile)
+        timer = StageTimer("tts", profiler=profiler)
 
+        # Prompts that were rendered before come straight from the result cache
+        backend = backend if "vits" in model_name else "pytorch"
+        cache = get_result_cache()
+        key = cache_key(model_name, text, speaker=speaker, backend=backend, device=device)
+        with timer.stage("cache_lookup"):
+            cached = cache.get(key)
+        if cached is not None:
+            print("Found this text in the cache, skipping synthesis.")
+            with timer.stage("write"):
+                write_audio(file_name, *cached, target_rate=sample_rate, bit_depth=bit_depth)
         else:
-            print("\nInvalid choice. Using default female voice (LJ Speech/FastPitch).")
-            tts = TTS(model_name="tts_models/en/ljspeech/fast_pitch", progress_bar=False, gpu=False)
-            tts.tts_to_file(
-                text=text,
-                file_path=file_name
-            )
+            with timer.stage("model_load"):
+                # The pool builds the model, or loads the artifact written by vits_export.py, and
+                # applies the runtime config (device, threads, int8 mode) and the frontend cache
+                tts = get_pool().get(model_name, device, backend)
+
+            if speaker:
+                print(f"Generating speech with male voice ({speaker})...")
+            else:
+                print("Generating speech with female voice...")
+            # Long texts are rendered chunk by chunk (in parallel processes with --workers) and crossfaded together
+            start = time.perf_counter()
+            with timer.stage("synthesis"):
+                wav = render_long_text(tts, text, speaker=speaker, workers=workers)
+            # Frontend time is part of the synthesis time, the rest went to the acoustic model
+            print(f"Synthesized in {time.perf_counter() - start:.2f} s ({get_frontend_cache().stats_text()})")
+            with timer.stage("write"):
+                cache.put(key, wav, tts.synthesizer.output_sample_rate)
+                write_audio(file_name, wav, tts.synthesizer.output_sample_rate, target_rate=sample_rate,
+                            bit_depth=bit_depth)
+        print(f"({cache.stats_text()})")
+        timer.finish()
+        if profiler is not None:
+            print(f"\n{profiler.report}\nProfile written to {profiler.base}.*")
 
         print(f"\nAudio successfully saved to {file_name}")
         return file_name
@@ -48,13 +84,34 @@ def text_to_speech():
     except Exception as e:
         print(f"\nError occurred: {e}")
         return None
+    finally:
+        if profiler is not None:
+            # Failed runs still leave their partial profile behind
+            profiler.finish()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Text-to-speech with the standard voices")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch",
+                        help="run an exported ONNX/TorchScript model (see vits_export.py)")
+    parser.add_argument("--format", choices=list(FORMATS), default="wav",
+                        help="output format; compressed formats depend on the local soundfile/libsndfile")
+    parser.add_argument("--sample-rate", type=int, help="resample the output to this rate")
+    parser.add_argument("--bit-depth", type=int, choices=[16, 24, 32], default=16, help="bit depth for WAV/FLAC")
+    parser.add_argument("--device", default="auto", help="auto (GPU if usable, see runtime_config.py), cpu or cuda")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="profile the request: spans only, or spans plus cProfile / torch.profiler")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="render the chunks of a long text in this many forked processes (CPU only)")
+    args = parser.parse_args()
+
     print("FastPitch Text-to-Speech Generator (Male and Female Voices)")
     print("---------------------------------------------------------")
+    print(f"Runtime: {get_runtime_config().describe()}")
 
-    result = text_to_speech()
+    result = text_to_speech(backend=args.backend, audio_format=args.format,
+                            sample_rate=args.sample_rate, bit_depth=args.bit_depth, profile=args.profile,
+                            device=args.device, workers=args.workers)
 
     if result:
         print(f"\nAudio file created: {result}")
@@ -0,0 +1,240 @@
+"""Export the VITS voices to ONNX or TorchScript and run them without TTS.api.
+
+The standard voices normally go through the full Coqui stack (TTS.api, the
+Synthesizer and the PyTorch model). Exporting traces the model once into a
+single artifact; ExportedTTS then loads that artifact plus the model's text
+config and synthesizes with ONNX Runtime or the TorchScript interpreter.
+Loading is much faster than building the Coqui model, there is less Python
+on the hot path, and an ONNX worker only needs onnxruntime, numpy and the
+Coqui text frontend (tokenizer and phonemizer), not the model code or torch.
+
+ExportedTTS has the same surface as TTS.api.TTS as far as this project is
+concerned (tts(), synthesizer.output_sample_rate, synthesizer.save_wav, to()),
+so the model pool, streaming, chunking and the caches work with it unchanged.
+
+Export once (artifacts go to ~/.cache/tts_voice_cloning/exported):
+    python vits_export.py --voice female --format onnx
+    python vits_export.py --voice male --format torchscript
+then pick the backend with --backend onnx in the scripts or "Backend" in the GUI.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from cache_paths import cache_dir
+from streaming import SENTENCE_PAUSE_SAMPLES
+from voices import TTS_MODELS
+
+EXPORT_FORMATS = ("onnx", "torchscript")
+ARTIFACT_NAMES = {"onnx": "model.onnx", "torchscript": "model.ts"}
+
+DEFAULT_EXPORT_DIR = cache_dir("exported", "TTS_EXPORT_DIR")
+
+
+def export_path(model_name, export_dir=DEFAULT_EXPORT_DIR):
+    return os.path.join(export_dir, model_name.replace("/", "--"))
+
+
+def is_exported(model_name, backend, export_dir=DEFAULT_EXPORT_DIR):
+    return os.path.isfile(os.path.join(export_path(model_name, export_dir), ARTIFACT_NAMES[backend]))
+
+
+def _trace_wrapper(vits):
+    """nn.Module with a tensor-only forward, the same one Coqui uses for its ONNX export"""
+    from torch import nn
+
+    class TracedVits(nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.vits = vits
+
+        def forward(self, text, text_lengths, scales, sid):
+            self.vits.inference_noise_scale = scales[0]
+            self.vits.length_scale = scales[1]
+            self.vits.inference_noise_scale_dp = scales[2]
+            aux_input = {"x_lengths": text_lengths, "d_vectors": None, "language_ids": None,
+                         "speaker_ids": sid if self.vits.num_speakers > 0 else None}
+            return self.vits.inference(text, aux_input=aux_input)["model_outputs"]
+
+    return TracedVits()
+
+
+def export_model(model_name, fmt="onnx", export_dir=DEFAULT_EXPORT_DIR):
+    """Trace a VITS model into an ONNX or TorchScript artifact, returns the artifact path"""
+    import torch
+    from model_pool import ModelPool
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of: {', '.join(EXPORT_FORMATS)}")
+    # A private pool: the export changes model attributes and must not touch a shared instance
+    tts = ModelPool(cpu_mode=False).get(model_name, "cpu")
+    synthesizer = tts.synthesizer
+    vits = synthesizer.tts_model
+    if type(vits).__name__ != "Vits":
+        raise ValueError(f"{model_name} is not a VITS model, only VITS voices can be exported")
+    vits.eval()
+
+    target_dir = export_path(model_name, export_dir)
+    os.makedirs(target_dir, exist_ok=True)
+    artifact = os.path.join(target_dir, ARTIFACT_NAMES[fmt])
+    scales = [float(vits.inference_noise_scale), float(vits.length_scale), float(vits.inference_noise_scale_dp)]
+    speakers = dict(vits.speaker_manager.name_to_id) if getattr(vits, "speaker_manager", None) else {}
+
+    if fmt == "onnx":
+        # Coqui ships an exporter for VITS; its graph inputs are input, input_lengths, scales[, sid]
+        vits.export_onnx(output_path=artifact, verbose=False)
+    else:
+        text = torch.randint(low=0, high=20, size=(1, 50), dtype=torch.long)
+        inputs = (text, torch.LongTensor([text.shape[1]]), torch.FloatTensor(scales), torch.LongTensor([0]))
+        wrapper = _trace_wrapper(vits)
+        with torch.no_grad():
+            # Output lengths depend on the predicted durations, so the checker would always complain
+            traced = torch.jit.trace(wrapper, inputs, check_trace=False)
+        traced.save(artifact)
+        vits.inference_noise_scale, vits.length_scale, vits.inference_noise_scale_dp = scales
+
+    # Everything the runtime needs besides the graph: text config, speakers, scales
+    synthesizer.tts_config.save_json(os.path.join(target_dir, "config.json"))
+    with open(os.path.join(target_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "format": fmt,
+            "sample_rate": synthesizer.output_sample_rate,
+            "scales": scales,
+            "speakers": speakers,
+        }, f, indent=2)
+    return artifact
+
+
+class ExportedSynthesizer:
+    def __init__(self, sample_rate):
+        self.tts_model = None  # no PyTorch module to hook or measure
+        self.vocoder_model = None
+        self.output_sample_rate = sample_rate
+
+    def save_wav(self, wav, path):
+        from result_cache import write_wav
+        write_wav(path, wav, self.output_sample_rate)
+
+
+class ExportedTTS:
+    """Runs an exported VITS artifact; a drop-in for TTS.api.TTS in this project"""
+
+    def __init__(self, model_name, backend="onnx", device="cpu", export_dir=DEFAULT_EXPORT_DIR):
+        if backend not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of: {', '.join(EXPORT_FORMATS)}")
+        directory = export_path(model_name, export_dir)
+        artifact = os.path.join(directory, ARTIFACT_NAMES[backend])
+        if not os.path.isfile(artifact):
+            raise FileNotFoundError(
+                f"{model_name} has not been exported to {backend} yet, "
+                f"run: python vits_export.py --model {model_name} --format {backend}"
+            )
+        with open(os.path.join(directory, "export.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        from TTS.tts.configs.vits_config import VitsConfig
+        from TTS.tts.utils.text.tokenizer import TTSTokenizer
+        config = VitsConfig()
+        config.load_json(os.path.join(directory, "config.json"))
+        self.tokenizer, _ = TTSTokenizer.init_from_config(config)
+
+        self.model_name = model_name
+        self.backend = backend
+        self.device = device
+        self.speakers = meta["speakers"]
+        self.scales = np.array(meta["scales"], dtype=np.float32)
+        self.synthesizer = ExportedSynthesizer(meta["sample_rate"])
+        self.size_mb = os.path.getsize(artifact) / (1024 * 1024)
+
+        if backend == "onnx":
+            import onnxruntime as ort
+            from runtime_config import get_runtime_config
+            providers = ["CUDAExecutionProvider", "CPUExecutionProvider"] if device == "cuda" else ["CPUExecutionProvider"]
+            # Same thread budget as the PyTorch models get
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = get_runtime_config().threads_for(device) or 0  # 0: onnxruntime's default
+            self.session = ort.InferenceSession(artifact, sess_options=options, providers=providers)
+            self.input_names = {i.name for i in self.session.get_inputs()}
+        else:
+            import torch
+            self.module = torch.jit.load(artifact, map_location=device)
+            self.module.eval()
+
+    def to(self, device):
+        # The device is chosen when the artifact is loaded
+        return self
+
+    def speaker_id(self, speaker):
+        if not self.speakers:
+            return 0
+        if speaker not in self.speakers:
+            raise ValueError(f"Unknown speaker '{speaker}' for {self.model_name}")
+        return self.speakers[speaker]
+
+    def infer(self, ids, speaker=None):
+        """Run the exported graph on one token sequence, returns a float32 waveform"""
+        x = np.asarray([ids], dtype=np.int64)
+        lengths = np.array([x.shape[1]], dtype=np.int64)
+        sid = np.array([self.speaker_id(speaker)], dtype=np.int64)
+        if self.backend == "onnx":
+            inputs = {"input": x, "input_lengths": lengths, "scales": self.scales}
+            if "sid" in self.input_names:
+                inputs["sid"] = sid
+            wav = self.session.run(["output"], inputs)[0]
+        else:
+            import torch
+            with torch.inference_mode():
+                wav = self.module(torch.from_numpy(x).to(self.device), torch.from_numpy(lengths).to(self.device),
+                                  torch.from_numpy(self.scales).to(self.device),
+                                  torch.from_numpy(sid).to(self.device)).cpu().numpy()
+        return np.asarray(wav, dtype=np.float32).squeeze()
+
+    def tts(self, text, speaker=None, split_sentences=True, **kwargs):
+        """Same contract as TTS.api.TTS.tts: a list of floats with a pause after each sentence"""
+        if split_sentences:
+            from streaming import split_sentences as split
+            sentences = split(text)
+        else:
+            sentences = [text]
+        pause = np.zeros(SENTENCE_PAUSE_SAMPLES, dtype=np.float32)
+        parts = []
+        for sentence in sentences:
+            parts.append(self.infer(self.tokenizer.text_to_ids(sentence), speaker=speaker))
+            parts.append(pause)
+        return np.concatenate(parts).tolist()
+
+
+def load_exported(model_name, backend, device="cpu"):
+    """ModelPool loader for exported artifacts"""
+    return ExportedTTS(model_name, backend=backend, device=device)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a VITS voice to ONNX or TorchScript")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--voice", choices=list(TTS_MODELS["standard"]), default="female")
+    target.add_argument("--model", help="Coqui model name of a VITS model (instead of --voice)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="onnx")
+    parser.add_argument("--export-dir", default=DEFAULT_EXPORT_DIR)
+    args = parser.parse_args()
+
+    model_name = args.model or TTS_MODELS["standard"][args.voice]
+    start = time.perf_counter()
+    artifact = export_model(model_name, args.format, args.export_dir)
+    print(f"Exported {model_name} to {artifact} in {time.perf_counter() - start:.1f} s")
+
+    # Load it back once, which also shows the load time of the exported backend
+    start = time.perf_counter()
+    tts = ExportedTTS(model_name, backend=args.format, export_dir=args.export_dir)
+    load_time = time.perf_counter() - start
+    speaker = next(iter(tts.speakers), None)
+    wav = tts.tts("The exported model works.", speaker=speaker)
+    print(f"Loaded in {load_time:.2f} s, test sentence is {len(wav) / tts.synthesizer.output_sample_rate:.1f} s of audio")
+
+
+if __name__ == "__main__":
+    main()
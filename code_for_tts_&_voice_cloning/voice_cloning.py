@@ -1,32 +1,64 @@
-from TTS.api import TTS
-import torch
-import functools
+import argparse
+from audio_output import FORMATS, write_audio
+from chunking import render_long_text
+from model_pool import get_pool
+from pipeline_metrics import StageTimer
+from profiling import PROFILE_MODES, profiler_for
+from result_cache import cache_key, get_result_cache
+from runtime_config import get_runtime_config, resolve_device
+from voice_library import get_voice_library
 
-# Save the original torch.load function
-original_torch_load = torch.load
-# Create a wrapper that forces weights_only=False
-#to bypass the security check at source of the checkpoint
-@functools.wraps(original_torch_load)
-def patched_torch_load(*args, **kwargs):
-    kwargs['weights_only'] = False
-    return original_torch_load(*args, **kwargs)
+model_name = "tts_models/multilingual/multi-dataset/xtts_v2"
+text = "Alright It's February now and why are you still waiting to have that better relationship with your wife ."
+file_path = "output_xtts3.wav"
+speaker_wav = r"C:\Users\SAI HITESH KOTA\Desktop\pythonproject\user_voice3.wav"  # Update this path
+language = "en"
 
-torch.load = patched_torch_load
+parser = argparse.ArgumentParser(description="Clone a voice with XTTS v2")
+parser.add_argument("--voice", help="name of a voice in the voice library, instead of speaker_wav")
+parser.add_argument("--format", choices=list(FORMATS), default="wav", help="output format, e.g. flac or opus")
+parser.add_argument("--device", default="auto", help="auto (GPU if usable, see runtime_config.py), cpu or cuda")
+parser.add_argument("--profile", choices=PROFILE_MODES,
+                    help="profile the run: spans only, or spans plus cProfile / torch.profiler")
+parser.add_argument("--workers", type=int, default=1,
+                    help="render the chunks of a long text in this many forked processes (CPU only)")
+args = parser.parse_args()
+profiler = profiler_for("voice_cloning", mode=args.profile)
+timer = StageTimer("voice_cloning", profiler=profiler)
+file_path = f"{file_path.rsplit('.', 1)[0]}.{args.format}"
+if args.voice:
+    # Latents come straight from the library's memory map, the clip is never decoded
+    speaker_wav = get_voice_library().load(args.voice)
+
+device = resolve_device(args.device)
+print(f"Runtime: {get_runtime_config().describe()}")
 
 try:
-    # Initialize the TTS model
-    tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2", gpu=True)
+    # Reuse the audio if this text was already cloned with this sample
+    cache = get_result_cache()
+    key = cache_key(model_name, text, speaker_wav=speaker_wav, language=language, device=device)
+    with timer.stage("cache_lookup"):
+        cached = cache.get(key)
+    if cached is not None:
+        with timer.stage("write"):
+            write_audio(file_path, *cached)
+    else:
+        with timer.stage("model_load"):
+            # The pool loads XTTS (bypassing the torch.load weights-only check for its
+            # checkpoint) straight onto the device, with the runtime config's threads
+            tts = get_pool().get(model_name, device)
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    tts.to(device)
-    
-    # Generate speech by cloning a voice
-    tts.tts_to_file(
-        text="Alright It's February now and why are you still waiting to have that better relationship with your wife .",
-        file_path="output_xtts3.wav",
-        speaker_wav= r"C:\Users\SAI HITESH KOTA\Desktop\pythonproject\user_voice3.wav",  # Update this path
-        language="en"
-    )
+        # Generate speech by cloning a voice (speaker latents are cached per reference clip).
+        # Long texts are split to XTTS's per-language limit and crossfaded back together.
+        with timer.stage("synthesis"):
+            wav = render_long_text(tts, text, speaker_wav=speaker_wav, language=language,
+                                   workers=args.workers)
+        with timer.stage("write"):
+            cache.put(key, wav, tts.synthesizer.output_sample_rate)
+            write_audio(file_path, wav, tts.synthesizer.output_sample_rate)
+    timer.finish()
+    if profiler is not None:
+        print(f"{profiler.report}\nProfile written to {profiler.base}.*")
 finally:
-    # Restore the original torch.load function
-    torch.load = original_torch_load
\ No newline at end of file
+    if profiler is not None:
+        profiler.finish()
\ No newline at end of file
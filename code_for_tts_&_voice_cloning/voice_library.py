@@ -0,0 +1,276 @@
+"""Named library of cloned voices backed by one memory-mapped latents file.
+
+Layout of the library directory:
+    clips/<name>-<id>.wav  the reference clip of every voice
+    latents.f32        XTTS latents of all voices, one fixed-size float32 row each
+    index.json         name -> row, clip, audio hash and metadata
+
+Loading a voice maps latents.f32 once and slices out its row, so it costs
+the same for the first voice as for the five hundredth and never decodes
+audio or runs the speaker encoder. The slice is handed to the speaker cache
+under the clip's audio hash, so the rest of the code keeps passing the clip
+path around as speaker_wav and finds the latents already in memory.
+
+Example:
+    python voice_library.py add narrator recordings/narrator.wav --tags calm male
+    python voice_library.py list calm
+    python voice_cloning.py --voice narrator
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from cache_paths import cache_dir
+from speaker_cache import get_speaker_cache
+
+DEFAULT_LIBRARY_DIR = cache_dir("voices", "TTS_VOICE_LIBRARY_DIR")
+MODEL_TAG = "xtts_v2"
+
+
+def clip_file_name(name, clip_path):
+    """File name for a voice's clip; the hash of the name keeps "a b" and "a_b" apart"""
+    name_id = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return f"{name.replace(' ', '_')}-{name_id}{os.path.splitext(clip_path)[1].lower() or '.wav'}"
+
+
+class VoiceLibrary:
+    """Directory-backed store of reference clips and their precomputed latents"""
+
+    def __init__(self, directory=DEFAULT_LIBRARY_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+        self.latents_path = os.path.join(directory, "latents.f32")
+        self._index = None
+        self._index_mtime = None
+        self._latents = None  # np.memmap over latents.f32
+        self._clip_names = {}  # normalized clip path -> voice name
+        self._lock = threading.Lock()
+
+    # Index -----------------------------------------------------------------
+
+    def _load_index(self):
+        """The index, re-read if another process changed it"""
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._index is None or mtime != self._index_mtime:
+            if mtime is None:
+                self._index = {"row_size": None, "rows": 0, "voices": {}}
+            else:
+                with open(self.index_path, encoding="utf-8") as f:
+                    self._index = json.load(f)
+            self._index_mtime = mtime
+            self._map_clips(self._index)
+        return self._index
+
+    def _save_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+        self._map_clips(index)
+
+    def _map_clips(self, index):
+        self._clip_names = {os.path.normcase(os.path.abspath(self._clip_file(entry))): name
+                            for name, entry in index["voices"].items()}
+
+    def _clip_file(self, entry):
+        return os.path.join(self.directory, entry["clip"])
+
+    def names(self):
+        with self._lock:
+            return sorted(self._load_index()["voices"])
+
+    def info(self, name):
+        with self._lock:
+            return dict(self._entry(name))
+
+    def _entry(self, name):
+        voices = self._load_index()["voices"]
+        if name not in voices:
+            raise KeyError(f"No voice named '{name}' in {self.directory}")
+        return voices[name]
+
+    def search(self, query=""):
+        """Names whose name or tags contain every word of the query, case-insensitive"""
+        words = query.lower().split()
+        with self._lock:
+            voices = self._load_index()["voices"]
+            matches = []
+            for name, entry in voices.items():
+                haystack = " ".join([name] + entry.get("tags", [])).lower()
+                if all(word in haystack for word in words):
+                    matches.append(name)
+        return sorted(matches)
+
+    def clip_path(self, name):
+        with self._lock:
+            return self._clip_file(self._entry(name))
+
+    # Latents ---------------------------------------------------------------
+
+    def _row(self, row, row_size, rows):
+        """One row of the latents file as a read-only view"""
+        if self._latents is None or self._latents.shape[0] < rows:
+            # Re-map after other voices were appended
+            self._latents = np.memmap(self.latents_path, dtype=np.float32, mode="r", shape=(rows, row_size))
+        return self._latents[row]
+
+    def latents(self, name):
+        """(gpt_cond_latent, speaker_embedding) as numpy arrays, sliced from the memory map"""
+        with self._lock:
+            index = self._load_index()
+            entry = self._entry(name)
+            row = self._row(entry["row"], index["row_size"], index["rows"])
+        gpt_size = int(np.prod(entry["gpt_shape"]))
+        return (np.array(row[:gpt_size]).reshape(entry["gpt_shape"]),
+                np.array(row[gpt_size:]).reshape(entry["speaker_shape"]))
+
+    def load(self, name, cache=None):
+        """Make a voice ready for cloning, returns its clip path to use as speaker_wav"""
+        clip = self.clip_path(name)
+        self._prime(name, clip, cache or get_speaker_cache())
+        return clip
+
+    def prime(self, speaker_wav, cache=None):
+        """If speaker_wav is a library clip, put its latents in the speaker cache; returns True if it was"""
+        with self._lock:
+            self._load_index()
+            name = self._clip_names.get(os.path.normcase(os.path.abspath(speaker_wav)))
+        if name is None:
+            return False
+        self._prime(name, speaker_wav, cache or get_speaker_cache())
+        return True
+
+    def _prime(self, name, clip, cache):
+        import torch
+        entry = self.info(name)
+        stat = os.stat(clip)
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            # The clip was edited after it was added, let the speaker cache recompute
+            return
+        gpt_cond_latent, speaker_embedding = self.latents(name)
+        cache.remember(clip, entry["audio_hash"], (torch.from_numpy(gpt_cond_latent),
+                                                   torch.from_numpy(speaker_embedding)),
+                       model_tag=entry.get("model_tag", MODEL_TAG))
+
+    # Changes ---------------------------------------------------------------
+
+    def add(self, name, clip_path, model, tags=(), cache=None):
+        """Copy a reference clip into the library and store its latents"""
+        if not re.fullmatch(r"[\w .-]+", name):
+            raise ValueError("Voice names may only contain letters, digits, spaces, '.', '_' and '-'")
+        with self._lock:
+            if name in self._load_index()["voices"]:
+                raise ValueError(f"A voice named '{name}' already exists, remove it first")
+        cache = cache or get_speaker_cache()
+        clips_dir = os.path.join(self.directory, "clips")
+        os.makedirs(clips_dir, exist_ok=True)
+        clip_name = clip_file_name(name, clip_path)
+        target = os.path.join(clips_dir, clip_name)
+        if os.path.abspath(clip_path) != os.path.abspath(target):
+            shutil.copyfile(clip_path, target)
+
+        # The speaker cache reuses latents already computed for the same audio
+        gpt_cond_latent, speaker_embedding = (latent.detach().cpu().numpy() for latent in
+                                              cache.get_latents(model, target, model_tag=MODEL_TAG))
+        row = np.concatenate([gpt_cond_latent.ravel(), speaker_embedding.ravel()]).astype(np.float32)
+        stat = os.stat(target)
+
+        with self._lock:
+            index = self._load_index()
+            if name in index["voices"]:
+                raise ValueError(f"A voice named '{name}' already exists, remove it first")
+            if index["row_size"] is None:
+                index["row_size"] = row.size
+            elif index["row_size"] != row.size:
+                raise ValueError(f"Latents of size {row.size} do not match the library's {index['row_size']}")
+            # Append the row first; the index only points at it once it is on disk
+            with open(self.latents_path, "ab") as f:
+                f.seek(index["rows"] * row.size * 4)
+                f.truncate()
+                f.write(row.tobytes())
+            index["voices"][name] = {
+                "row": index["rows"],
+                "clip": os.path.join("clips", clip_name),
+                "audio_hash": cache.audio_hash(target),
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "gpt_shape": list(gpt_cond_latent.shape),
+                "speaker_shape": list(speaker_embedding.shape),
+                "model_tag": MODEL_TAG,
+                "tags": list(tags),
+                "added": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            index["rows"] += 1
+            self._save_index(index)
+        return target
+
+    def remove(self, name):
+        """Drop a voice from the index; its latents row stays unused in the file"""
+        with self._lock:
+            index = self._load_index()
+            entry = index["voices"].pop(name, None)
+            if entry is None:
+                raise KeyError(f"No voice named '{name}' in {self.directory}")
+            self._save_index(index)
+        try:
+            os.remove(self._clip_file(entry))
+        except OSError:
+            pass
+
+
+_default_library = None
+_default_library_lock = threading.Lock()
+
+
+def get_voice_library():
+    global _default_library
+    with _default_library_lock:
+        if _default_library is None:
+            _default_library = VoiceLibrary()
+        return _default_library
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the library of cloned voices")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="add a reference clip under a name")
+    add.add_argument("name")
+    add.add_argument("clip")
+    add.add_argument("--tags", nargs="*", default=[])
+    add.add_argument("--device", default="auto", help="auto, cpu or cuda")
+    listing = commands.add_parser("list", help="list voices, optionally filtered")
+    listing.add_argument("query", nargs="*")
+    remove = commands.add_parser("remove", help="remove a voice")
+    remove.add_argument("name")
+    args = parser.parse_args()
+
+    library = get_voice_library()
+    if args.command == "add":
+        from model_pool import get_pool
+        from voices import TTS_MODELS
+        model = get_pool().get(TTS_MODELS["xtts"], args.device).synthesizer.tts_model
+        library.add(args.name, args.clip, model, tags=args.tags)
+        print(f"Added '{args.name}' to {library.directory}")
+    elif args.command == "list":
+        for name in library.search(" ".join(args.query)):
+            tags = library.info(name).get("tags", [])
+            print(f"{name}{'  [' + ', '.join(tags) + ']' if tags else ''}")
+    else:
+        library.remove(args.name)
+        print(f"Removed '{args.name}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Voice names and the Coqui models behind them, shared by the GUI and the scripts"""
+
+TTS_MODELS = {
+    "standard": {
+        "female": "tts_models/en/ljspeech/vits",
+        "male": "tts_models/en/vctk/vits"
+    },
+    "xtts": "tts_models/multilingual/multi-dataset/xtts_v2"
+}
+
+# Voices accepted by the scripts: the two standard voices plus XTTS cloning
+VOICES = ("female", "male", "clone")
+
+# How the female/male voices run: the Coqui PyTorch model, or an artifact written by vits_export.py
+BACKENDS = ("pytorch", "onnx", "torchscript")
+
+
+def model_for_voice(voice):
+    """Model name for a voice ("female", "male" or "clone")"""
+    if voice == "clone":
+        return TTS_MODELS["xtts"]
+    if voice not in TTS_MODELS["standard"]:
+        raise ValueError(f"Unknown voice '{voice}', expected one of: {', '.join(VOICES)}")
+    return TTS_MODELS["standard"][voice]
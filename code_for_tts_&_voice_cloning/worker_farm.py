@@ -0,0 +1,152 @@
+"""Process farm whose workers share the models loaded once by the parent.
+
+A process pool where every worker loads its own copy of XTTS needs N times
+the memory. WorkerFarm loads the models into the parent's model pool first
+and then forks the workers. The weights are never written after loading, so
+the workers share those pages with the parent copy-on-write and only pay for
+their own activations. The garbage collector is frozen before the fork,
+because collecting would touch the object headers and copy their pages.
+
+Fork is only safe on CPU (a forked CUDA context does not work) and only
+where the platform has it (Linux, macOS), see can_share_models().
+
+Running this module measures the scaling:
+    python worker_farm.py --voice clone --speaker-wav me.wav --workers 1 2 4 8
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from model_pool import get_pool
+from runtime_config import configure, get_runtime_config
+
+
+def can_share_models(device="cpu"):
+    return device == "cpu" and "fork" in multiprocessing.get_all_start_methods()
+
+
+def _init_worker(threads_per_worker):
+    from cpu_mode import configure_threads
+    configure(device="cpu", threads=threads_per_worker, max_jobs=1)
+    try:
+        configure_threads(threads_per_worker)
+    except (ImportError, OSError):
+        pass  # exported ONNX voices do not need torch
+
+
+def _worker_pid():
+    return os.getpid()
+
+
+class WorkerFarm:
+    """ProcessPoolExecutor over forked workers that inherit the parent's loaded models"""
+
+    def __init__(self, models, workers, threads_per_worker=None, device="cpu"):
+        """models is a list of (model_name, backend) pairs to load before forking"""
+        if not can_share_models(device):
+            raise RuntimeError("Shared-model workers need fork and a CPU device")
+        pool = get_pool()
+        for model_name, backend in models:
+            pool.get(model_name, device, backend)
+        self.workers = workers
+        # The workers split the cores between them
+        threads_per_worker = threads_per_worker or get_runtime_config().threads_for("cpu", jobs=workers)
+
+        gc.collect()
+        gc.freeze()
+        self.executor = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context("fork"),
+                                            initializer=_init_worker,
+                                            initargs=(threads_per_worker,))
+        # With fork the first submit starts every worker, while the parent is still idle
+        self.executor.submit(_worker_pid).result()
+
+    def submit(self, fn, *args, **kwargs):
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def memory_mb(self):
+        """Resident and proportional (shared pages split between processes) memory per process.
+
+        Returns {pid: (rss_mb, pss_mb)} for the parent and the workers; Linux only, empty elsewhere.
+        """
+        usage = {}
+        for pid in [os.getpid()] + [child.pid for child in multiprocessing.active_children()]:
+            fields = {}
+            try:
+                with open(f"/proc/{pid}/smaps_rollup") as f:
+                    for line in f:
+                        name, _, value = line.partition(":")
+                        if name in ("Rss", "Pss"):
+                            fields[name] = int(value.split()[0]) / 1024
+            except OSError:
+                continue
+            if len(fields) == 2:
+                usage[pid] = (fields["Rss"], fields["Pss"])
+        return usage
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        gc.unfreeze()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _render(text, speaker=None, speaker_wav=None, language=None, model_name=None, backend="pytorch"):
+    """Worker task: render one text with a model the parent loaded, returns (audio s, compute s)"""
+    from chunking import render_long_text
+    tts = get_pool().get(model_name, "cpu", backend)
+    start = time.perf_counter()
+    wav = render_long_text(tts, text, speaker=speaker, speaker_wav=speaker_wav, language=language, workers=1)
+    return len(wav) / tts.synthesizer.output_sample_rate, time.perf_counter() - start
+
+
+def main():
+    from voices import VOICES, model_for_voice
+
+    parser = argparse.ArgumentParser(description="Measure throughput and memory of the shared-model worker farm")
+    parser.add_argument("--voice", choices=VOICES, default="female")
+    parser.add_argument("--speaker-wav", help="reference sample for the clone voice")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads-per-worker", type=int, help="default: the cores split between the workers")
+    parser.add_argument("--requests", type=int, default=16, help="requests per measurement")
+    args = parser.parse_args()
+    if args.voice == "clone" and not args.speaker_wav:
+        parser.error("--speaker-wav is required for the clone voice")
+
+    model_name = model_for_voice(args.voice)
+    voice = {"model_name": model_name}
+    if args.voice == "male":
+        voice["speaker"] = "p226"
+    elif args.voice == "clone":
+        voice.update(speaker_wav=args.speaker_wav, language="en")
+    text = ("Your order has been shipped and should arrive within three business days. "
+            "Thank you for your patience.")
+
+    print(f"{'workers':>8}{'req/s':>8}{'scaling':>9}{'RSS MB':>9}{'PSS MB':>9}")
+    baseline = None
+    for workers in args.workers:
+        with WorkerFarm([(model_name, "pytorch")], workers, args.threads_per_worker) as farm:
+            # One warm-up request per worker
+            for future in [farm.submit(_render, text, **voice) for _ in range(workers)]:
+                future.result()
+            start = time.perf_counter()
+            for future in [farm.submit(_render, text, **voice) for _ in range(args.requests)]:
+                future.result()
+            throughput = args.requests / (time.perf_counter() - start)
+            memory = farm.memory_mb()
+        baseline = baseline or throughput / workers
+        rss = sum(rss for rss, _ in memory.values())
+        pss = sum(pss for _, pss in memory.values())
+        # PSS counts each shared page once in total, RSS once per process
+        print(f"{workers:>8}{throughput:>8.2f}{throughput / baseline:>8.2f}x{rss:>9.0f}{pss:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Helpers for playing in-memory waveforms through the pygame mixer"""
+from collections import deque
+
+import numpy as np
+import pygame
+
+
+def make_sound(wav, sample_rate):
+    """Convert a mono float waveform into a pygame Sound in the mixer's format"""
+    mixer_freq, mixer_format, mixer_channels = pygame.mixer.get_init()
+    wav = np.asarray(wav, dtype=np.float32)
+
+    # Linear resampling is plenty for playback and avoids re-initialising the mixer
+    if sample_rate != mixer_freq and len(wav) > 1:
+        n_out = int(round(len(wav) * mixer_freq / sample_rate))
+        wav = np.interp(np.linspace(0, len(wav) - 1, n_out), np.arange(len(wav)), wav)
+    wav = np.clip(wav, -1.0, 1.0)
+
+    bits = abs(mixer_format)
+    if bits == 8:
+        samples = ((wav + 1.0) * 127.5).astype(np.uint8)
+    elif bits == 32:
+        samples = wav.astype(np.float32)
+    else:
+        samples = (wav * 32767).astype(np.int16)
+
+    if mixer_channels > 1:
+        samples = np.repeat(samples[:, None], mixer_channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples))
+
+
+class StreamPlayer:
+    """Plays in-memory waveforms, or chunks back to back, on a reserved mixer channel"""
+
+    def __init__(self, root, channel_id=0):
+        self.root = root
+        pygame.mixer.set_reserved(channel_id + 1)
+        self.channel = pygame.mixer.Channel(channel_id)
+        self.pending = deque()
+        self.active = False
+        self.paused = False
+
+    def enqueue(self, wav, sample_rate):
+        """Add a chunk; playback starts right away if the channel is idle"""
+        self.pending.append(make_sound(wav, sample_rate))
+        if not self.active:
+            self.active = True
+            self._pump()
+
+    def play(self, wav, sample_rate):
+        """Replace whatever is playing with a complete waveform"""
+        self.stop()
+        self.enqueue(wav, sample_rate)
+
+    def pause(self):
+        self.channel.pause()
+        self.paused = True
+
+    def resume(self):
+        self.channel.unpause()
+        self.paused = False
+
+    def _pump(self):
+        if not self.active:
+            return
+        if self.paused:
+            self.root.after(20, self._pump)
+            return
+        if not self.channel.get_busy() and self.pending:
+            self.channel.play(self.pending.popleft())
+        # The channel holds one queued sound, top it up as soon as it is taken
+        if self.channel.get_queue() is None and self.pending:
+            self.channel.queue(self.pending.popleft())
+
+        if self.pending or self.channel.get_busy():
+            self.root.after(20, self._pump)
+        else:
+            self.active = False
+
+    def is_busy(self):
+        return self.active or self.channel.get_busy()
+
+    def stop(self):
+        self.active = False
+        self.paused = False
+        self.pending.clear()
+        self.channel.stop()
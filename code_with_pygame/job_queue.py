@@ -0,0 +1,123 @@
+"""Generation job queue for the GUI.
+
+Jobs from both tabs go into one queue. Each device (cpu, cuda) has its own
+worker thread, so a device only ever runs one model at a time. A worker
+prefers jobs for the model it ran last, which avoids switching models back
+and forth when jobs for different voices are interleaved.
+"""
+import itertools
+import threading
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, label, model_name, device, payload):
+        self.id = next(Job._ids)
+        self.label = label
+        self.model_name = model_name
+        self.device = device
+        self.payload = payload  # whatever the run function needs
+        self.status = PENDING
+        self.progress = 0.0  # 0.0 - 1.0
+        self.error = None
+        self.result = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Called by the run function between steps to stop a cancelled job"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+
+class JobScheduler:
+    """Runs jobs on one worker thread per device"""
+
+    def __init__(self, run_job, on_update=None, max_same_model=4):
+        self.run_job = run_job
+        self.on_update = on_update or (lambda job: None)
+        # Run at most this many jobs in a row for one model while others are waiting
+        self.max_same_model = max_same_model
+        self._pending = []
+        self._condition = threading.Condition()
+        self._workers = {}
+        self._last_model = {}  # device -> (model name, jobs in a row)
+
+    def submit(self, job):
+        with self._condition:
+            self._pending.append(job)
+            if job.device not in self._workers:
+                worker = threading.Thread(target=self._worker, args=(job.device,), daemon=True)
+                self._workers[job.device] = worker
+                worker.start()
+            self._condition.notify_all()
+        self.on_update(job)
+        return job
+
+    def cancel(self, job):
+        job.cancel()
+        with self._condition:
+            was_pending = job in self._pending
+            if was_pending:
+                self._pending.remove(job)
+                job.status = CANCELLED
+        # A running job stops at its next check_cancelled()
+        if was_pending:
+            self.on_update(job)
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def _next_job(self, device):
+        candidates = [job for job in self._pending if job.device == device]
+        if not candidates:
+            return None
+        last_model, run_length = self._last_model.get(device, (None, 0))
+        if run_length < self.max_same_model:
+            for job in candidates:
+                if job.model_name == last_model:
+                    return job
+        return candidates[0]
+
+    def _worker(self, device):
+        while True:
+            with self._condition:
+                job = self._next_job(device)
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job(device)
+                self._pending.remove(job)
+                last_model, run_length = self._last_model.get(device, (None, 0))
+                run_length = run_length + 1 if job.model_name == last_model else 1
+                self._last_model[device] = (job.model_name, run_length)
+                job.status = RUNNING
+            self.on_update(job)
+
+            try:
+                job.result = self.run_job(job)
+                job.progress = 1.0
+                job.status = DONE
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            self.on_update(job)
@@ -1,40 +1,98 @@
+import time
+_STARTED = time.perf_counter()  # For the startup time measurement
 import tkinter as tk
-from tkinter import ttk, filedialog
+from tkinter import ttk, filedialog, simpledialog
 import threading
+import queue
+import json
+import logging
 import os
+import sys
 import pygame
-import time
-import torch
-import functools
-from TTS.api import TTS
+# torch, TTS and soundfile are imported lazily: torch is loaded by the warm-up
+# thread after the window is shown, soundfile only when saving
 from PIL import Image, ImageTk, ImageDraw
-import io
-import numpy as np
-import librosa
-import soundfile as sf
+
+# Shared TTS helpers live next to the command-line scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "code_for_tts_&_voice_cloning"))
+from model_pool import get_pool
+from voices import TTS_MODELS, BACKENDS
+from streaming import synthesize_sentence
+from chunking import split_text, crossfade_concat
+from document import DocumentRenderer, read_document
+from voice_library import get_voice_library
+from result_cache import cache_key, get_result_cache
+from audio_output import available_formats, write_audio
+from cache_paths import CACHE_ROOT
+from audio_playback import StreamPlayer
+from pipeline_metrics import StageTimer, track_vocoder_time
+from frontend_cache import thread_seconds as frontend_seconds
+from profiling import profiler_for
+from runtime_config import get_runtime_config, model_lock
+from job_queue import Job, JobScheduler, RUNNING, DONE, FAILED, CANCELLED
+from pitch_shift import PITCH_SHIFT_MODES, pitch_shift
+
+# Last used tab, voice and language, so the next start can pre-load that model
+SETTINGS_PATH = os.path.join(CACHE_ROOT, "gui_settings.json")
+metrics_logger = logging.getLogger("tts.metrics")
+
+
+def load_settings():
+    try:
+        with open(SETTINGS_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_settings(settings):
+    try:
+        os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
+        with open(SETTINGS_PATH, "w", encoding="utf-8") as f:
+            json.dump(settings, f)
+    except OSError:
+        pass
 
 class ModernTTSApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Voice Generator")
-        self.root.geometry("800x600")
-        self.root.minsize(700, 550)
+        self.root.geometry("800x720")
+        self.root.minsize(700, 650)
         self.root.configure(bg="#f5f5f7")
         
         # Set application icon
         self.setup_icon()
         
         # Initialize variables
-        self.output_file = "output.wav"
-        self.original_output_file = "original_output.wav"  # For pitch modification
+        # Generated audio stays in memory; it only goes to disk through "Save As..."
+        self.original_audio = None  # Before pitch modification
+        self.output_audio = None
+        self.sample_rate = None
+        self.last_request = None  # Settings that produced original_audio
+        self.last_pitch_factor = 1.0  # Pitch of output_audio, or of the pitch change queued last
         self.is_playing = False
         self.is_paused = False
         self.voice_clone_sample = None  # Store path to voice sample
-        self.use_gpu = tk.BooleanVar(value=torch.cuda.is_available())
+        # Named reference clips with precomputed latents, listed in the Voice Clone tab
+        self.voice_library = get_voice_library()
+        self.settings = load_settings()
+        # The GPU check needs torch, so it happens in the warm-up thread
+        self.cuda_available = False
+        self.use_gpu = tk.BooleanVar(value=self.settings.get("use_gpu", True))
+        self.gpu_status_var = tk.StringVar(value="Checking for GPU...")
         pygame.mixer.init()
+        self.player = StreamPlayer(self.root)
         
         # Initialize pitch control variable
         self.pitch_factor = tk.DoubleVar(value=1.0)  # Default pitch (normal)
+        self.pitch_mode = tk.StringVar(value="quality")  # "fast" trades some quality for speed
+        
+        # Runtime for the standard voices: PyTorch, or a model exported by vits_export.py
+        self.backend = tk.StringVar(value="pytorch")
+        
+        # Start playback on the first sentence while the rest is still rendering
+        self.stream_playback = tk.BooleanVar(value=True)
         
         # Setup theme and styles
         self.setup_styles()
@@ -43,17 +101,33 @@ class ModernTTSApp:
         self.create_widgets()
         
         # Initialize TTS models
-        self.tts_models = {
-            "standard": {
-                "female": "tts_models/en/ljspeech/vits",
-                "male": "tts_models/en/vctk/vits"
-            },
-            "xtts": "tts_models/multilingual/multi-dataset/xtts_v2"
-        }
+        self.tts_models = TTS_MODELS
         
         # Set default TTS mode
         self.tts_mode = tk.StringVar(value="standard")
         
+        # Models are loaded once and shared by both tabs
+        self.model_pool = get_pool()
+        
+        # Finished audio is cached on disk, shared with the command-line scripts
+        self.result_cache = get_result_cache()
+        
+        # Generation jobs from both tabs are queued and run by per-device workers
+        self.jobs = {}
+        self.streaming_job_id = None  # Job whose sentences are currently streamed
+        self.stream_lock = threading.Lock()
+        # Workers never touch Tk; they post job, stage and audio events to this queue
+        self.ui_events = queue.Queue()
+        self.scheduler = JobScheduler(
+            self._generate_speech_thread,
+            on_update=lambda job: self.ui_events.put(("job", job))
+        )
+        self._poll_ui_events()
+        
+        self.restore_settings()
+        # Load torch and the last used model once the window is on screen
+        self.root.after_idle(self.start_warm_up)
+        
     def setup_icon(self):
         # Create a simple microphone icon
         icon_size = 32
@@ -232,6 +306,15 @@ class ModernTTSApp:
                       value="male", 
                       style='TRadiobutton').pack(side=tk.LEFT)
         
+        # Backend selection
+        ttk.Label(voice_frame, text="Backend:", style='TLabel').pack(side=tk.LEFT, padx=(25, 5))
+        backend_dropdown = ttk.Combobox(voice_frame, 
+                                      textvariable=self.backend, 
+                                      values=list(BACKENDS),
+                                      state="readonly",
+                                      width=11)
+        backend_dropdown.pack(side=tk.LEFT)
+        
         # Pitch control section
         pitch_frame = ttk.Frame(settings_frame, style='TFrame')
         pitch_frame.pack(fill=tk.X, pady=(0, 10))
@@ -261,7 +344,16 @@ class ModernTTSApp:
         
         # Bind the slider to update the label
         self.pitch_slider.bind("<Motion>", self.update_pitch_label)
-        self.pitch_slider.bind("<ButtonRelease-1>", self.update_pitch_label)
+        self.pitch_slider.bind("<ButtonRelease-1>", self.on_pitch_changed)
+        
+        # Pitch engine selection
+        ttk.Label(pitch_frame, text="Engine:", style='TLabel').pack(side=tk.LEFT, padx=(10, 5))
+        pitch_mode_dropdown = ttk.Combobox(pitch_frame, 
+                                         textvariable=self.pitch_mode, 
+                                         values=list(PITCH_SHIFT_MODES),
+                                         state="readonly",
+                                         width=8)
+        pitch_mode_dropdown.pack(side=tk.LEFT)
         
     def create_clone_tab(self, parent):
         # Text input section
@@ -300,6 +392,33 @@ class ModernTTSApp:
                               style='Action.TButton')
         browse_btn.pack(side=tk.RIGHT)
         
+        # Voice library: search by name or tag, selecting a voice uses its stored clip
+        library_frame = ttk.Frame(sample_frame, style='TFrame')
+        library_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(library_frame, text="Library:", style='TLabel').pack(side=tk.LEFT, anchor=tk.N, padx=(0, 10))
+        
+        self.library_search_var = tk.StringVar()
+        self.library_search_var.trace_add("write", lambda *args: self.refresh_voice_list())
+        search_entry = ttk.Entry(library_frame, textvariable=self.library_search_var, width=18)
+        search_entry.pack(side=tk.LEFT, anchor=tk.N, padx=(0, 10))
+        
+        self.voice_list = tk.Listbox(library_frame, 
+                                   height=3, 
+                                   exportselection=False,
+                                   font=('Segoe UI', 10),
+                                   borderwidth=1,
+                                   relief=tk.SOLID)
+        self.voice_list.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
+        self.voice_list.bind("<<ListboxSelect>>", self.on_library_voice_selected)
+        
+        add_voice_btn = ttk.Button(library_frame, 
+                                 text="Add to Library", 
+                                 command=self.add_sample_to_library,
+                                 style='Action.TButton')
+        add_voice_btn.pack(side=tk.RIGHT, anchor=tk.N)
+        self.refresh_voice_list()
+        
         # Language selection for XTTS
         lang_frame = ttk.Frame(parent, style='TFrame')
         lang_frame.pack(fill=tk.X, pady=(5, 10))
@@ -339,14 +458,8 @@ class ModernTTSApp:
                                  style='TCheckbutton')
         gpu_check.pack(anchor=tk.W, pady=(10, 5))
         
-        # Show GPU status
-        if torch.cuda.is_available():
-            gpu_info = f"GPU detected: {torch.cuda.get_device_name(0)}"
-        else:
-            gpu_info = "No GPU detected, using CPU"
-            self.use_gpu.set(False)
-            
-        gpu_status = ttk.Label(parent, text=gpu_info, style='Status.TLabel')
+        # Show GPU status, filled in by the warm-up thread
+        gpu_status = ttk.Label(parent, textvariable=self.gpu_status_var, style='Status.TLabel')
         gpu_status.pack(anchor=tk.W, pady=(0, 10))
         
     def create_common_controls(self, parent):
@@ -361,6 +474,13 @@ class ModernTTSApp:
                                      style='Primary.TButton')
         self.generate_btn.pack(side=tk.LEFT, padx=(0, 8))
         
+        # Document mode: narrate a .txt/.md file, re-rendering only edited paragraphs
+        narrate_btn = ttk.Button(btn_frame, 
+                               text="Narrate File...", 
+                               command=self.narrate_document,
+                               style='Action.TButton')
+        narrate_btn.pack(side=tk.LEFT, padx=(0, 8))
+        
         # Media control buttons
         controls_frame = ttk.Frame(btn_frame, style='TFrame')
         controls_frame.pack(side=tk.LEFT)
@@ -393,6 +513,33 @@ class ModernTTSApp:
                                  state=tk.DISABLED)
         self.save_btn.pack(side=tk.LEFT)
         
+        stream_check = ttk.Checkbutton(btn_frame, 
+                                     text="Play while generating", 
+                                     variable=self.stream_playback,
+                                     style='TCheckbutton')
+        stream_check.pack(side=tk.LEFT, padx=(15, 0))
+        
+        # Job list with per-job status and progress
+        jobs_frame = ttk.Frame(parent, style='TFrame')
+        jobs_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        self.job_list = ttk.Treeview(jobs_frame, 
+                                   columns=("id", "text", "voice", "status", "progress"), 
+                                   show="headings",
+                                   height=4)
+        for column, heading, width in (("id", "#", 40), ("text", "Text", 300), ("voice", "Voice", 170),
+                                       ("status", "Status", 90), ("progress", "Progress", 80)):
+            self.job_list.heading(column, text=heading)
+            self.job_list.column(column, width=width, stretch=(column == "text"))
+        self.job_list.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.job_list.bind("<<TreeviewSelect>>", self._on_job_selected)
+        
+        cancel_btn = ttk.Button(jobs_frame, 
+                              text="Cancel", 
+                              command=self.cancel_selected_jobs,
+                              style='Danger.TButton')
+        cancel_btn.pack(side=tk.LEFT, anchor=tk.N, padx=(8, 0))
+        
         # Status bar with a cleaner look
         status_frame = ttk.Frame(parent, style='TFrame')
         status_frame.pack(fill=tk.X, side=tk.BOTTOM)
@@ -428,6 +575,43 @@ class ModernTTSApp:
             self.sample_path_var.set(filename)
             self.status_var.set(f"Voice sample selected: {filename}")
     
+    def refresh_voice_list(self):
+        """Show the library voices matching the search box"""
+        self.voice_list.delete(0, tk.END)
+        for name in self.voice_library.search(self.library_search_var.get()):
+            self.voice_list.insert(tk.END, name)
+    
+    def on_library_voice_selected(self, event=None):
+        selection = self.voice_list.curselection()
+        if not selection:
+            return
+        name = self.voice_list.get(selection[0])
+        self.voice_clone_sample = self.voice_library.clip_path(name)
+        self.sample_path_var.set(f"Library voice: {name}")
+        self.status_var.set(f"Voice '{name}' selected from the library")
+    
+    def add_sample_to_library(self):
+        """Store the selected voice sample and its latents in the library under a name"""
+        if not self.voice_clone_sample:
+            self.status_var.set("Please select a voice sample to add")
+            return
+        name = simpledialog.askstring("Add to Voice Library", "Name for this voice:", parent=self.root)
+        if not name or not name.strip():
+            return
+        device = "cuda" if self.use_gpu.get() and self.cuda_available else "cpu"
+        self.status_var.set(f"Adding '{name.strip()}' to the voice library...")
+        # Computing the latents needs the XTTS model, so it runs off the main thread
+        threading.Thread(target=self._add_to_library_thread,
+                         args=(name.strip(), self.voice_clone_sample, device), daemon=True).start()
+    
+    def _add_to_library_thread(self, name, sample, device):
+        try:
+            model = self.model_pool.get(self.tts_models["xtts"], device).synthesizer.tts_model
+            self.voice_library.add(name, sample, model)
+            self.ui_events.put(("library", f"Added '{name}' to the voice library"))
+        except Exception as e:
+            self.ui_events.put(("library", f"Could not add voice: {str(e)}"))
+    
     def update_pitch_label(self, event=None):
         pitch_value = self.pitch_factor.get()
         pitch_text = f"{pitch_value:.1f}"
@@ -441,182 +625,442 @@ class ModernTTSApp:
             
         self.pitch_value_label.config(text=pitch_text)
     
-    def ensure_file_available(self):
-        """Make sure the output file is not in use and can be overwritten"""
-        # Stop any playback
-        if self.is_playing:
-            pygame.mixer.music.stop()
-            self.is_playing = False
-            self.is_paused = False
-            
-        # Unload the file from pygame
-        pygame.mixer.music.unload()
-        
-        # Give the system a moment to release the file
-        time.sleep(0.2)
-        
-        # Try to remove the files if they exist
-        for file_path in [self.output_file, self.original_output_file]:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    # If we can't remove it, create a new filename
-                    timestamp = int(time.time())
-                    self.original_output_file = f"original_output_{timestamp}.wav"
-                    self.output_file = f"output_{timestamp}.wav"
-                    self.status_var.set(f"Using new file: {self.output_file}")
-                    break
+    def stop_playback(self):
+        """Stop any playback before new audio replaces the current result"""
+        self.player.stop()
+        self.is_playing = False
+        self.is_paused = False
     
     def generate_speech(self):
         # Determine which tab is active
         current_tab = self.notebook.index(self.notebook.select())
         if current_tab == 0:  # Standard TTS tab
             text = self.text_input.get("1.0", tk.END).strip()
-            mode = "standard"
         else:  # Voice Clone tab
             text = self.clone_text_input.get("1.0", tk.END).strip()
-            mode = "xtts"
-            
-            # Check if voice sample is selected for clone mode
-            if mode == "xtts" and not self.voice_clone_sample:
-                self.status_var.set("Please select a voice sample for cloning")
-                return
         
         if not text:
             self.status_var.set("Please enter some text to convert")
             return
         
-        self.status_var.set("Preparing to generate speech...")
-        self.generate_btn.configure(state=tk.DISABLED)
-        self.play_btn.configure(state=tk.DISABLED)
-        self.pause_btn.configure(state=tk.DISABLED)
-        self.stop_btn.configure(state=tk.DISABLED)
-        self.save_btn.configure(state=tk.DISABLED)
+        settings = self.voice_settings(current_tab)
+        if settings is None:
+            return
+        label, request, device, pitch_factor = settings
+        request["text"] = text
+        self.submit_job(label, request, device, pitch_factor)
+    
+    def narrate_document(self):
+        """Narrate a text or Markdown file with the active tab's voice"""
+        file_path = filedialog.askopenfilename(
+            title="Select Document",
+            filetypes=[("Text and Markdown", "*.txt *.md *.markdown"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        try:
+            paragraphs = read_document(file_path)
+        except (OSError, UnicodeDecodeError) as e:
+            self.status_var.set(f"Error reading document: {str(e)}")
+            return
+        if not paragraphs:
+            self.status_var.set("The document has no text to read")
+            return
         
-        # Show progress animation
-        self.progress['value'] = 0
-        self.start_progress_animation()
-        
-        # Ensure the file is available for writing
-        self.ensure_file_available()
-        
-        # Run TTS in a separate thread to prevent UI freezing
-        self.status_var.set("Generating speech...")
-        threading.Thread(target=self._generate_speech_thread, args=(text, mode), daemon=True).start()
-    
-    def start_progress_animation(self):
-        """Animate the progress bar during generation"""
-        def update_progress():
-            if self.progress['value'] < 90 and self.generate_btn['state'] == tk.DISABLED:
-                # Slowly fill to 90% while processing
-                current = self.progress['value']
-                increment = 0.5 if current < 50 else 0.2
-                self.progress['value'] = current + increment
-                self.root.after(100, update_progress)
-        update_progress()
-    
-    def _generate_speech_thread(self, text, mode):
+        settings = self.voice_settings(self.notebook.index(self.notebook.select()))
+        if settings is None:
+            return
+        label, request, device, pitch_factor = settings
+        # Paragraphs that did not change since the last run come from the segment cache
+        request["text"] = "\n\n".join(paragraphs)
+        request["paragraphs"] = paragraphs
+        self.submit_job(f"{os.path.basename(file_path)}, {label}", request, device, pitch_factor)
+    
+    def voice_settings(self, current_tab):
+        """Return (label, request, device, pitch factor) for the tab's voice, or None if incomplete"""
+        # Check if voice sample is selected for clone mode
+        if current_tab == 1 and not self.voice_clone_sample:
+            self.status_var.set("Please select a voice sample for cloning")
+            return None
+        
+        self.save_current_settings(current_tab)
+        
+        # Read every setting now, the job may run much later on a worker thread
+        if current_tab == 0:
+            voice_type = self.voice_var.get()
+            device = "cpu"
+            request = {"model_name": self.tts_models["standard"][voice_type],
+                       "speaker": "p226" if voice_type == "male" else None}
+            pitch_factor = self.pitch_factor.get()
+            label = f"{voice_type.capitalize()} voice"
+        else:
+            device = "cuda" if self.use_gpu.get() and self.cuda_available else "cpu"
+            request = {"model_name": self.tts_models["xtts"],
+                       "speaker_wav": self.voice_clone_sample,
+                       "language": self.language_var.get()}
+            # Pitch adjustment only applies to standard voices
+            pitch_factor = 1.0
+            label = f"Clone ({os.path.basename(self.voice_clone_sample)})"
+        return label, request, device, pitch_factor
+    
+    def submit_job(self, label, request, device, pitch_factor):
+        """Queue a generation job; the scheduler runs it when its device is free"""
+        payload = {
+            "request": request,
+            "pitch_factor": pitch_factor,
+            "pitch_mode": self.pitch_mode.get(),
+            # Exported models only exist for the VITS voices
+            "backend": "pytorch" if "speaker_wav" in request else self.backend.get(),
+            "stream": self.stream_playback.get(),
+        }
+        job = Job(label, request["model_name"], device, payload)
+        self.jobs[job.id] = job
+        preview = request["text"] if len(request["text"]) <= 40 else request["text"][:37] + "..."
+        self.job_list.insert("", tk.END, iid=str(job.id),
+                             values=(job.id, preview, label, job.status, "0%"))
+        self.scheduler.submit(job)
+        
+        pending = self.scheduler.pending_count()
+        self.status_var.set(f"Queued job {job.id} ({pending} waiting)")
+    
+    def cancel_selected_jobs(self):
+        for iid in self.job_list.selection():
+            job = self.jobs.get(int(iid))
+            if job is not None and not job.finished:
+                self.scheduler.cancel(job)
+                if self.streaming_job_id == job.id:
+                    self.stop_playback()
+    
+    def _generate_speech_thread(self, job):
+        """Run one generation job on a scheduler worker thread"""
+        # Stage timings go to the metrics log and, through the UI queue, to the progress bar.
+        # With TTS_PROFILE set the job is profiled as well (see profiling.py).
+        profiler = profiler_for(f"job-{job.id}")
+        timer = StageTimer(job.id, on_event=lambda record: self.ui_events.put(("metrics", record)),
+                           profiler=profiler)
         try:
-            # Patch torch.load to bypass security checks for XTTS
-            if mode == "xtts":
-                # Save the original torch.load function
-                original_torch_load = torch.load
-                # Create a wrapper that forces weights_only=False
-                @functools.wraps(original_torch_load)
-                def patched_torch_load(*args, **kwargs):
-                    kwargs['weights_only'] = False
-                    return original_torch_load(*args, **kwargs)
-                torch.load = patched_torch_load
+            return self._generate_speech(job, timer)
+        finally:
+            if profiler is not None and not profiler.finished:
+                # Cancelled and failed jobs still leave their partial profile behind
+                profiler.finish()
+    
+    def _generate_speech(self, job, timer):
+        """Render one job, reporting its stages to the timer"""
+        settings = job.payload
+        request = settings["request"]
+        pitch_factor = settings["pitch_factor"]
+        shift_pitch = abs(pitch_factor - 1.0) > 0.01
+        
+        if request.get("speaker_wav"):
+            # Library voices get their latents from the memory map, no decoding or hashing
+            self.voice_library.prime(request["speaker_wav"])
+        
+        if "paragraphs" in request:
+            return self._render_document(job, timer)
+        
+        # Repeated requests are served straight from the result cache. The unshifted
+        # audio is cached too, so a new pitch only needs the shift re-applied.
+        base_key = cache_key(**request, backend=settings["backend"], device=job.device)
+        key = cache_key(**request, backend=settings["backend"], device=job.device, pitch_factor=pitch_factor,
+                        pitch_mode=settings["pitch_mode"]) if shift_pitch else base_key
+        with timer.stage("cache_lookup"):
+            cached = self.result_cache.get(key)
+            base = self.result_cache.get(base_key) if shift_pitch else cached
+        if cached is not None:
+            output, sample_rate = cached
+            self._stream_chunk(job, output, sample_rate)
+            timer.finish(cache_hit=True, audio_seconds=round(len(output) / sample_rate, 3))
+            return request, base[0] if base is not None else None, output, sample_rate, True
+        
+        if base is not None:
+            original, sample_rate = base
+            with timer.stage("post_processing"):
+                output = self.pitch_shift_array(original, sample_rate, pitch_factor, settings["pitch_mode"])
+            self._stream_chunk(job, output, sample_rate)
+        else:
+            job.check_cancelled()
+            backend = settings["backend"]
+            with timer.stage("model_load", warm=self.model_pool.is_loaded(job.model_name, job.device, backend)):
+                tts = self._get_model(job.model_name, job.device, backend)
+            sample_rate = tts.synthesizer.output_sample_rate
             
-            try:
-                if mode == "standard":
-                    # Standard TTS
-                    voice_type = self.voice_var.get()
-                    model_name = self.tts_models["standard"][voice_type]
+            # Sentence by sentence, so playback can start early, progress is real
+            # and a cancelled job stops at the next sentence. Sentences over the
+            # model's budget for the language are cut at clauses. A pitch shift is
+            # applied once to the stitched result, exactly as a later slider move
+            # does, so only unshifted jobs play their sentences as they finish.
+            with timer.stage("segmentation"):
+                sentences = split_text(request["text"], request.get("language") or "en")
+            timer.progress(0, len(sentences))
+            original_chunks = []
+            with track_vocoder_time(tts) as vocoder:
+                for index, sentence in enumerate(sentences):
+                    job.check_cancelled()
+                    # Time spent waiting for another job on the same model is its own stage
+                    wait_start = time.perf_counter()
+                    with model_lock(tts):
+                        start = time.perf_counter()
+                        timer.record("model_wait", start - wait_start, sentence=index + 1)
+                        vocoder_before = vocoder.seconds
+                        frontend_before = frontend_seconds()
+                        wav = synthesize_sentence(tts, sentence, speaker=request.get("speaker"),
+                                                  speaker_wav=request.get("speaker_wav"),
+                                                  language=request.get("language"))
+                    vocoder_seconds = vocoder.seconds - vocoder_before
+                    # Text cleaning and phonemization (memoized by the frontend cache)
+                    sentence_frontend = frontend_seconds() - frontend_before
+                    timer.record("frontend", sentence_frontend, sentence=index + 1)
+                    timer.record("inference", time.perf_counter() - start - vocoder_seconds - sentence_frontend,
+                                 sentence=index + 1)
+                    timer.record("vocoder", vocoder_seconds, sentence=index + 1)
                     
-                    if voice_type == "male":
-                        tts = TTS(model_name=model_name, progress_bar=False)
-                        tts.tts_to_file(text=text, file_path=self.original_output_file, speaker="p226")
-                    else:
-                        tts = TTS(model_name=model_name, progress_bar=False)
-                        tts.tts_to_file(text=text, file_path=self.original_output_file)
-                else:
-                    # XTTS Voice Cloning
-                    device = "cuda" if self.use_gpu.get() and torch.cuda.is_available() else "cpu"
-                    language = self.language_var.get()
-                    
-                    tts = TTS(self.tts_models["xtts"], gpu=self.use_gpu.get())
-                    tts.to(device)
-                    
-                    tts.tts_to_file(
-                        text=text,
-                        file_path=self.original_output_file,
-                        speaker_wav=self.voice_clone_sample,
-                        language=language
-                    )
-            finally:
-                # Restore the original torch.load function if patched
-                if mode == "xtts" and 'original_torch_load' in locals():
-                    torch.load = original_torch_load
-            
-            # Apply pitch shift with librosa if pitch is not 1.0 (normal) and in standard mode
-            pitch_factor = self.pitch_factor.get()
-            if mode == "standard" and abs(pitch_factor - 1.0) > 0.01:
-                self.status_var.set("Applying pitch adjustment...")
-                self.apply_pitch_shift(pitch_factor)
-            else:
-                # Just copy the file if no pitch change
-                import shutil
-                shutil.copy2(self.original_output_file, self.output_file)
+                    original_chunks.append(wav)
+                    if not shift_pitch:
+                        self._stream_chunk(job, wav, sample_rate)
+                    timer.progress(index + 1, len(sentences))
             
-            # Update UI on the main thread
-            self.root.after(0, self._on_generation_complete)
-        except Exception as e:
-            error_msg = f"Error generating speech: {str(e)}"
-            self.root.after(0, lambda: self._on_generation_error(error_msg))
+            original = crossfade_concat(original_chunks, sample_rate)
+            output = original
+            with timer.stage("write"):
+                self.result_cache.put(base_key, original, sample_rate)
+            if shift_pitch:
+                with timer.stage("post_processing"):
+                    output = self.pitch_shift_array(original, sample_rate, pitch_factor, settings["pitch_mode"])
+                self._stream_chunk(job, output, sample_rate)
+        
+        if shift_pitch:
+            with timer.stage("write"):
+                self.result_cache.put(key, output, sample_rate)
+        timer.finish(cache_hit=False, audio_seconds=round(len(output) / sample_rate, 3))
+        return request, original, output, sample_rate, False
+    
+    def _render_document(self, job, timer):
+        """Narrate a document paragraph by paragraph, synthesizing only changed paragraphs"""
+        settings = job.payload
+        request = settings["request"]
+        renderer = DocumentRenderer(
+            job.model_name,
+            lambda: self._get_model(job.model_name, job.device, settings["backend"]),
+            speaker=request.get("speaker"),
+            speaker_wav=request.get("speaker_wav"),
+            language=request.get("language"),
+            pitch_factor=settings["pitch_factor"],
+            pitch_mode=settings["pitch_mode"],
+            backend=settings["backend"],
+            device=job.device,
+        )
+        paragraphs = request["paragraphs"]
+        timer.progress(0, len(paragraphs), unit="paragraph")
+        with timer.stage("document", paragraphs=len(paragraphs)):
+            original, output, sample_rate = renderer.render(
+                paragraphs,
+                on_progress=lambda done, total: timer.progress(done, total, unit="paragraph"),
+                check_cancelled=job.check_cancelled,
+            )
+        self._stream_chunk(job, output, sample_rate)
+        timer.finish(paragraphs_synthesized=renderer.rendered, paragraphs_reused=renderer.reused,
+                     audio_seconds=round(len(output) / sample_rate, 3))
+        return request, original, output, sample_rate, renderer.rendered == 0
+    
+    def _stream_chunk(self, job, wav, sample_rate):
+        """Play a finished chunk right away if this job streams its audio"""
+        if not job.payload["stream"]:
+            return
+        # Only one job streams at a time so sentences from different jobs never interleave
+        with self.stream_lock:
+            if self.streaming_job_id is None:
+                self.streaming_job_id = job.id
+            if self.streaming_job_id != job.id:
+                return
+        self.ui_events.put(("stream", (wav, sample_rate)))
+    
+    def _on_stream_chunk(self, wav, sample_rate):
+        self.player.enqueue(wav, sample_rate)
+        self.stop_btn.configure(state=tk.NORMAL)
+        self.status_var.set("Playing while generating...")
+    
+    def _get_model(self, model_name, device, backend="pytorch"):
+        """Fetch a model from the shared pool, loading it on first use"""
+        return self.model_pool.get(model_name, device, backend)
+    
+    def pitch_shift_array(self, y, sr, pitch_factor, mode):
+        """Pitch shift a waveform held in memory with the given engine"""
+        return pitch_shift(y, sr, pitch_factor, mode=mode)
+    
+    def on_pitch_changed(self, event=None):
+        """Re-pitch the last plain-text standard-voice result (the unshifted audio comes from the cache)"""
+        self.update_pitch_label()
+        request = self.last_request
+        # Clone voices are not pitch shifted, and a document is re-pitched by narrating it again
+        if request is None or "speaker_wav" in request or "paragraphs" in request:
+            return
+        pitch_factor = self.pitch_factor.get()
+        # Same rounding as the cache key: a release without a real change queues nothing
+        if round(pitch_factor, 2) == round(self.last_pitch_factor, 2):
+            return
+        self.last_pitch_factor = pitch_factor
+        self.submit_job("Pitch change", request, "cpu", pitch_factor)
     
-    def apply_pitch_shift(self, pitch_factor):
-        """Apply pitch shifting to the generated audio"""
+    def _poll_ui_events(self):
+        """Apply job and stage events sent by the worker threads"""
         try:
-            # Load the audio file
-            y, sr = librosa.load(self.original_output_file, sr=None)
-            
-            # Calculate semitones based on pitch_factor (logarithmic scale)
-            n_steps = 12 * np.log2(pitch_factor)
-            
-            # Apply pitch shifting
-            y_shifted = librosa.effects.pitch_shift(y=y, sr=sr, n_steps=n_steps)
-            
-            # Save the result
-            sf.write(self.output_file, y_shifted, sr)
+            while True:
+                kind, item = self.ui_events.get_nowait()
+                if kind == "job":
+                    self._on_job_update(item)
+                elif kind == "stream":
+                    self._on_stream_chunk(*item)
+                elif kind == "warmup":
+                    self._on_warm_up(item)
+                elif kind == "library":
+                    self.status_var.set(item)
+                    self.refresh_voice_list()
+                else:
+                    self._on_metrics_event(item)
+        except queue.Empty:
+            pass
+        self.root.after(50, self._poll_ui_events)
+    
+    def restore_settings(self):
+        """Reopen the tab, voice and language used last time"""
+        if self.settings.get("tab") == 1:
+            self.notebook.select(1)
+        if self.settings.get("voice") in self.tts_models["standard"]:
+            self.voice_var.set(self.settings["voice"])
+        if self.settings.get("language"):
+            self.language_var.set(self.settings["language"])
+        if self.settings.get("backend") in BACKENDS:
+            self.backend.set(self.settings["backend"])
+    
+    def save_current_settings(self, current_tab):
+        self.settings = {
+            "tab": current_tab,
+            "voice": self.voice_var.get(),
+            "language": self.language_var.get(),
+            "use_gpu": self.use_gpu.get(),
+            "backend": self.backend.get(),
+        }
+        save_settings(self.settings)
+    
+    def start_warm_up(self):
+        # Decide on the main thread which model to pre-load, Tk variables are not thread-safe
+        if self.settings.get("tab") == 1:
+            model_name = self.tts_models["xtts"]
+            prefer_gpu = self.use_gpu.get()
+            backend = "pytorch"
+        else:
+            model_name = self.tts_models["standard"][self.voice_var.get()]
+            prefer_gpu = False
+            backend = self.backend.get()
+        threading.Thread(target=self._warm_up_thread, args=(model_name, prefer_gpu, backend), daemon=True).start()
+    
+    def _warm_up_thread(self, model_name, prefer_gpu, backend):
+        """Probe the machine (cores, memory, GPU) and pre-load the model that was used last"""
+        start = time.perf_counter()
+        try:
+            config = get_runtime_config()
+            self.ui_events.put(("warmup", {"gpu": config.gpu[0] if config.gpu else None}))
+            device = "cuda" if prefer_gpu and config.gpu else "cpu"
+            # Jobs submitted meanwhile wait on the pool lock instead of loading twice
+            self.model_pool.get(model_name, device, backend)
+            self.ui_events.put(("warmup", {"ready": model_name, "seconds": time.perf_counter() - start}))
         except Exception as e:
-            raise Exception(f"Error applying pitch shift: {str(e)}")
+            self.ui_events.put(("warmup", {"error": str(e)}))
     
-    def _on_generation_complete(self):
-        self.progress['value'] = 100
-        self.status_var.set(f"Audio generated successfully")
-        self.generate_btn.configure(state=tk.NORMAL)
+    def _on_warm_up(self, info):
+        if "gpu" in info:
+            self.cuda_available = info["gpu"] is not None
+            if self.cuda_available:
+                self.gpu_status_var.set(f"GPU detected: {info['gpu']}")
+            else:
+                self.gpu_status_var.set("No GPU detected, using CPU")
+                self.use_gpu.set(False)
+        elif "ready" in info:
+            metrics_logger.info(json.dumps({
+                "event": "warmup", "model": info["ready"], "seconds": round(info["seconds"], 4),
+                "since_start_s": round(time.perf_counter() - _STARTED, 4),
+            }))
+            if not self.jobs:
+                self.status_var.set("Ready")
+        else:
+            self.status_var.set(f"Could not pre-load model: {info['error']}")
+    
+    def report_startup_time(self):
+        """Log how long it took from process start until the window could take input"""
+        seconds = time.perf_counter() - _STARTED
+        metrics_logger.info(json.dumps({"event": "startup", "window_ready_s": round(seconds, 4)}))
+        return seconds
+    
+    def _on_metrics_event(self, record):
+        job = self.jobs.get(record["request"])
+        if job is None or job.finished:
+            return
+        if record["event"] == "progress":
+            job.progress = record["done"] / record["total"] if record["total"] else 0.0
+            self._on_job_update(job)
+            self.status_var.set(f"Job {job.id}: {record.get('unit', 'sentence')} {record['done']} of {record['total']} done")
+        elif record["event"] == "stage" and record["stage"] == "model_load" and not record.get("warm"):
+            self.status_var.set(f"Job {job.id}: model loaded in {record['seconds']:.1f} s")
+    
+    def _on_job_update(self, job):
+        """Job status change, runs on the main thread"""
+        if self.job_list.exists(str(job.id)):
+            self.job_list.set(str(job.id), "status", job.status)
+            self.job_list.set(str(job.id), "progress", f"{job.progress * 100:.0f}%")
+        
+        if job.status == RUNNING:
+            self.progress['value'] = job.progress * 100
+        if job.finished and self.streaming_job_id == job.id:
+            with self.stream_lock:
+                self.streaming_job_id = None
+        
+        if job.status == DONE:
+            self._on_generation_complete(job)
+        elif job.status == FAILED:
+            self._on_generation_error(f"Job {job.id} failed: {job.error}")
+        elif job.status == CANCELLED:
+            self.status_var.set(f"Job {job.id} cancelled")
+    
+    def _on_job_selected(self, event=None):
+        """Make the selected finished job the one Play and Save As use"""
+        selection = self.job_list.selection()
+        if len(selection) == 1:
+            job = self.jobs.get(int(selection[0]))
+            if job is not None and job.status == DONE:
+                self._set_current_result(job)
+    
+    def _set_current_result(self, job):
+        request, original, output, sample_rate, from_cache = job.result
+        self.last_request = request
+        self.last_pitch_factor = job.payload["pitch_factor"]
+        self.original_audio = original
+        self.output_audio = output
+        self.sample_rate = sample_rate
         self.play_btn.configure(state=tk.NORMAL)
         self.save_btn.configure(state=tk.NORMAL)
     
+    def _on_generation_complete(self, job):
+        self._set_current_result(job)
+        self.progress['value'] = 100
+        source = "from cache" if job.result[4] else "successfully"
+        self.status_var.set(f"Job {job.id}: audio generated {source} ({self.result_cache.stats_text()})")
+    
     def _on_generation_error(self, error_msg):
         self.progress['value'] = 0
         self.status_var.set(error_msg)
-        self.generate_btn.configure(state=tk.NORMAL)
     
     def play_audio(self):
-        if os.path.exists(self.output_file):
+        if self.output_audio is not None:
             try:
                 if self.is_paused:
                     # Resume playback
-                    pygame.mixer.music.unpause()
+                    self.player.resume()
                     self.is_paused = False
                     self.is_playing = True
                 else:
-                    # Start new playback
-                    pygame.mixer.music.load(self.output_file)
-                    pygame.mixer.music.play()
+                    # Start new playback straight from memory
+                    self.player.play(self.output_audio, self.sample_rate)
                     self.is_playing = True
                 
                 self.play_btn.configure(state=tk.DISABLED)
@@ -629,18 +1073,18 @@ class ModernTTSApp:
             except Exception as e:
                 self.status_var.set(f"Error playing audio: {str(e)}")
         else:
-            self.status_var.set("No audio file available. Generate speech first.")
+            self.status_var.set("No audio available. Generate speech first.")
     
     def pause_audio(self):
         if self.is_playing and not self.is_paused:
-            pygame.mixer.music.pause()
+            self.player.pause()
             self.is_paused = True
             self.is_playing = False
             self.play_btn.configure(state=tk.NORMAL)
             self.status_var.set("Playback paused")
     
     def check_playback_finished(self):
-        if not pygame.mixer.music.get_busy() and self.is_playing and not self.is_paused:
+        if not self.player.is_busy() and self.is_playing and not self.is_paused:
             self.is_playing = False
             self.play_btn.configure(state=tk.NORMAL)
             self.pause_btn.configure(state=tk.DISABLED)
@@ -652,36 +1096,44 @@ class ModernTTSApp:
                 self.root.after(100, self.check_playback_finished)
     
     def stop_audio(self):
-        if self.is_playing or self.is_paused:
-            pygame.mixer.music.stop()
-            self.is_playing = False
-            self.is_paused = False
-            self.play_btn.configure(state=tk.NORMAL)
+        if self.player.is_busy() or self.is_playing or self.is_paused:
+            self.stop_playback()
+            self.play_btn.configure(state=tk.NORMAL if self.output_audio is not None else tk.DISABLED)
             self.pause_btn.configure(state=tk.DISABLED)
             self.stop_btn.configure(state=tk.DISABLED)
             self.status_var.set("Playback stopped")
     
     def save_audio(self):
-        if not os.path.exists(self.output_file):
-            self.status_var.set("No audio file available. Generate speech first.")
+        if self.output_audio is None:
+            self.status_var.set("No audio available. Generate speech first.")
             return
         
+        # Compressed formats are offered if the local soundfile/libsndfile can write them
         file_path = filedialog.asksaveasfilename(
             defaultextension=".wav",
-            filetypes=[("WAV files", "*.wav"), ("All files", "*.*")]
+            filetypes=[(f"{ext.upper()} files", f"*.{ext}") for ext in available_formats()] + [("All files", "*.*")]
         )
         
         if file_path:
             try:
-                # If the user selected the same file, no need to copy
-                if file_path != self.output_file:
-                    import shutil
-                    shutil.copy2(self.output_file, file_path)
+                # This is the only place generated audio is written to disk
+                write_audio(file_path, self.output_audio, self.sample_rate)
                 self.status_var.set(f"Audio saved to: {os.path.basename(file_path)}")
             except Exception as e:
                 self.status_var.set(f"Error saving file: {str(e)}")
 
 if __name__ == "__main__":
+    # Stage timings are logged as one JSON object per line
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     root = tk.Tk()
     app = ModernTTSApp(root)
+    if "--measure-startup" in sys.argv:
+        # Print the time until the window is ready and exit, for checking startup regressions
+        def measure():
+            root.update()
+            print(f"Window ready after {app.report_startup_time():.3f} s")
+            root.destroy()
+        root.after_idle(measure)
+    else:
+        root.after_idle(app.report_startup_time)
     root.mainloop()
\ No newline at end of file